@@ -0,0 +1,112 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class WebhookASGI:
+    """Minimal ASGI app serving the Telegram webhook without a web framework.
+
+    Updates are handled on the event loop that serves the request. Under a
+    server with lifespan support (e.g. ``uvicorn bot:app``), the bot is bound
+    to that loop at startup and shut down with it, so there is one loop for
+    HTTP and bot alike. Without lifespan events (serverless runtimes), the
+    bot keeps its own long-lived loop and requests await it without blocking
+    a thread.
+
+    ``get_routes`` maps extra GET paths to callables returning
+    ``(status, content_type, body)``. ``on_startup`` and ``on_shutdown`` are
+    coroutine functions run with the lifespan events (e.g. starting and
+    stopping shard workers, which then take the place of ``ingest``).
+    """
+
+    def __init__(self, warm_app, ingest=None, queue_mode: bool = False, get_routes=None,
+                 on_startup=None, on_shutdown=None):
+        self.warm_app = warm_app
+        self.ingest = ingest
+        self.queue_mode = queue_mode
+        self.get_routes = dict(get_routes or {})
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            status, content_type, body, headers = await self._http(scope, receive)
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", content_type.encode())] + headers,
+            })
+            await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    self.warm_app.bind_running_loop()
+                    await self.warm_app.ensure_initialized()
+                    if self.on_startup:
+                        await self.on_startup()
+                except Exception as e:
+                    logger.error(f"Bot startup failed: {e}")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.on_shutdown:
+                    await self.on_shutdown()
+                await self.warm_app.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive):
+        method = scope["method"]
+        path = scope["path"]
+        text = "text/plain; charset=utf-8"
+
+        if method == "GET":
+            if path in self.get_routes:
+                status, content_type, body = self.get_routes[path]()
+                return status, content_type, body.encode(), []
+            return 200, text, b"Bot is running!", []
+        if method != "POST":
+            return 405, text, b"Method not allowed", []
+
+        body = await _read_body(receive)
+        try:
+            data = json.loads(body) if body is not None else None
+        except ValueError:
+            data = None
+
+        if not self.queue_mode:
+            if not isinstance(data, dict):
+                return 400, text, b"Bad update", []
+            await self.warm_app.submit(self.warm_app.process_update_json(data))
+            return 200, text, b"OK", []
+
+        status = self.ingest.submit(data)
+        if status == self.ingest.INVALID:
+            return 400, text, b"Bad update", []
+        if status == self.ingest.FULL:
+            return 429, text, b"Busy", [(b"retry-after", b"1")]
+        return 200, text, b"OK", []
+
+
+async def _read_body(receive):
+    """Read the request body, or None if it exceeds MAX_BODY_SIZE."""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
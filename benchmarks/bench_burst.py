@@ -0,0 +1,79 @@
+"""Burst of /cat-style requests: one upstream call per caller vs coalesced batches.
+
+N callers ask a PrefetchBuffer for an item at the same moment, with the
+buffer empty (the worst case). The upstream is simulated: every request
+takes --latency seconds and at most 10 run at once, like UpstreamClient's
+per-host limit. "per caller" is batch_size=1, i.e. one request per waiting
+caller as before; "coalesced" uses bot.py's defaults. Reports upstream
+requests and caller latency.
+
+Usage: python benchmarks/bench_burst.py [--callers N] [--latency S] [--batch-size N]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prefetch import PrefetchBuffer  # noqa: E402
+
+PER_HOST_LIMIT = 10
+
+
+class FakeUpstream:
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self._ids = itertools.count()
+        self._slots = asyncio.Semaphore(PER_HOST_LIMIT)
+
+    async def fetch(self, n):
+        async with self._slots:
+            self.requests += 1
+            await asyncio.sleep(self.latency)
+            return [next(self._ids) for _ in range(n)]
+
+
+async def burst(callers, latency, batch_size, max_fetches):
+    upstream = FakeUpstream(latency)
+    buffer = PrefetchBuffer("bench", upstream.fetch, 5, 2, 0, batch_size, max_fetches)
+
+    async def caller():
+        start = time.perf_counter()
+        await buffer.get()
+        return time.perf_counter() - start
+
+    waits = sorted(await asyncio.gather(*(caller() for _ in range(callers))))
+    await buffer.aclose()
+    return {
+        "requests": upstream.requests,
+        "p50_ms": statistics.median(waits) * 1e3,
+        "p99_ms": waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per upstream request")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--max-fetches", type=int, default=4)
+    args = parser.parse_args()
+
+    runs = {
+        "per caller": (1, PER_HOST_LIMIT),
+        "coalesced": (args.batch_size, args.max_fetches),
+    }
+    print(f"{args.callers} callers, {args.latency * 1e3:.0f} ms upstream latency")
+    print(f"{'':12}{'requests':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, (batch_size, max_fetches) in runs.items():
+        r = asyncio.run(burst(args.callers, args.latency, batch_size, max_fetches))
+        print(f"{name:12}{r['requests']:10}{r['p50_ms']:9.0f}{r['p99_ms']:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Callback dispatch: the previous regex handler chain vs CallbackRouter.
+
+Both are fed the same mix of button presses. "match" is the lookup alone
+(find the handler, parse the data), "process_update" is the full
+Application.process_update with no-op callbacks.
+
+Usage: python benchmarks/bench_callbacks.py [--updates N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import CallbackQuery, Message, Update, User  # noqa: E402
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler  # noqa: E402
+from telegram.request import BaseRequest  # noqa: E402
+
+from router import CallbackRouter  # noqa: E402
+
+# (callback_data, weight), roughly what a busy bot sees
+MIX = [
+    ("uno_p_{n}", 35), ("uno_draw", 10), ("uno_wait", 2),
+    ("math_ans_AAAAAAAAAAAAAAAAAAAAAAAAAA{n}", 25), ("math_start", 5),
+    ("rps_{choice}", 10), ("roll_dice", 8), ("joke_tok{n}_x", 5),
+]
+COMMANDS = ["start", "cat", "joke", "math", "rps", "dice", "uno"]
+
+
+class OfflineRequest(BaseRequest):
+    """Answers getMe (for Application.initialize); nothing else is sent."""
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        me = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        return 200, json.dumps({"ok": True, "result": me}).encode()
+
+
+async def noop(update, context, *args):
+    return None
+
+
+def legacy_handlers():
+    """bot.py's previous group 0, in registration order.
+
+    Each handler is paired with the parsing its callback then did on
+    query.data, so both sides do the same work.
+    """
+    def command(name):
+        return CommandHandler(name, noop), None
+
+    def button(pattern, parse):
+        return CallbackQueryHandler(noop, pattern=pattern), parse
+
+    return [
+        command("start"), command("cat"), command("joke"),
+        button("^joke_", lambda data: data[len("joke_"):]),
+        command("math"),
+        button("^math_start$", lambda data: None),
+        button("^math_ans_", lambda data: data[len("math_ans_"):]),
+        command("rps"),
+        button("^rps_", lambda data: data.split("_")[1]),
+        command("dice"),
+        button("^roll_dice$", lambda data: None),
+        command("uno"),
+        button("^uno_", lambda data: int(data.split("_")[-1]) if data.startswith("uno_p_") else data),
+    ]
+
+
+def router_handlers():
+    router = CallbackRouter()
+    router.add("joke_", noop)
+    router.add("math_start", noop)
+    router.add("math_ans_", noop)
+    router.add("rps_", noop, parse=lambda choice: (choice,))
+    router.add("roll_dice", noop)
+    router.add("uno_p_", noop, parse=lambda index: ("play", int(index)))
+    router.add("uno_draw", noop, args=("draw",))
+    router.add("uno_wait", noop, args=("wait",))
+    # Registered ahead of the commands, as in bot.py
+    return [(router, None)] + [(CommandHandler(name, noop), None) for name in COMMANDS]
+
+
+def make_updates(count, bot):
+    rng = random.Random(0)
+    user = User(7, "User", False)
+    templates, weights = zip(*MIX)
+    updates = []
+    for i in range(count):
+        data = rng.choices(templates, weights)[0].format(
+            n=rng.randrange(7), choice=rng.choice(["rock", "paper", "scissors"]),
+        )
+        message = Message(i, None, None)
+        query = CallbackQuery(str(i), user, "bench", message=message, data=data)
+        query.set_bot(bot)
+        updates.append(Update(i, callback_query=query))
+    return updates
+
+
+def match_seconds(handlers, updates):
+    start = time.perf_counter()
+    for update in updates:
+        for handler, parse in handlers:
+            result = handler.check_update(update)
+            if result:
+                if parse is not None:
+                    parse(update.callback_query.data)
+                break
+    return time.perf_counter() - start
+
+
+def process_seconds(handlers, updates):
+    request = OfflineRequest()
+    application = (
+        Application.builder().token("123456:bench").request(request).get_updates_request(request).build()
+    )
+    for handler, _ in handlers:
+        application.add_handler(handler)
+
+    async def run():
+        await application.initialize()
+        start = time.perf_counter()
+        for update in updates:
+            await application.process_update(update)
+        elapsed = time.perf_counter() - start
+        await application.shutdown()
+        return elapsed
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=50000)
+    args = parser.parse_args()
+
+    bot = Application.builder().token("123456:bench").build().bot
+    updates = make_updates(args.updates, bot)
+    legacy, routed = legacy_handlers(), router_handlers()
+
+    print(f"{'':16}{'regex chain':>14}{'router':>10}{'speedup':>9}   (us per update)")
+    for name, measure in (("match", match_seconds), ("process_update", process_seconds)):
+        old = min(measure(legacy, updates) for _ in range(3)) / args.updates * 1e6
+        new = min(measure(routed, updates) for _ in range(3)) / args.updates * 1e6
+        print(f"{name:16}{old:14.2f}{new:10.2f}{old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Per-send CPU cost of reply markups: built fresh each call vs the keyboards registry.
+
+Each case measures what a handler pays for its keyboard: building it (or
+looking it up) plus turning it into the JSON request parameter, the same way
+python-telegram-bot does before a send.
+
+Usage: python benchmarks/bench_keyboards.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup  # noqa: E402
+from telegram.request._requestparameter import RequestParameter  # noqa: E402
+
+import keyboards  # noqa: E402
+from uno import BUTTON_LABELS, UnoGame  # noqa: E402
+
+
+def send_cost(markup) -> str:
+    return RequestParameter.from_input("reply_markup", markup).json_value
+
+
+def fresh_start():
+    return ReplyKeyboardMarkup([['/joke', '/cat', '/uno'], ['/rps', '/math', '/dice']],
+                               resize_keyboard=True)
+
+
+def fresh_rps():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🪨 Rock", callback_data="rps_rock"),
+         InlineKeyboardButton("📄 Paper", callback_data="rps_paper")],
+        [InlineKeyboardButton("✂️ Scissors", callback_data="rps_scissors")],
+    ])
+
+
+def fresh_dice():
+    return InlineKeyboardMarkup([[InlineKeyboardButton("Roll Again 🎲", callback_data="roll_dice")]])
+
+
+def fresh_uno_hand(hand):
+    keyboard = []
+    row = []
+    for i, card in enumerate(hand):
+        row.append(InlineKeyboardButton(BUTTON_LABELS[card], callback_data=f"uno_p_{i}"))
+        if len(row) == 3:
+            keyboard.append(row)
+            row = []
+    if row:
+        keyboard.append(row)
+    keyboard.append([InlineKeyboardButton("📥 Draw a Card", callback_data="uno_draw")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def per_call_us(func, number=20000):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    hand = bytes(UnoGame.deal(random.Random(3)).user_hand)
+    hands = [bytes(UnoGame.deal(random.Random(seed)).user_hand) for seed in range(5000)]
+    cycle = iter(range(10 ** 9))
+
+    cases = [
+        ("start (reply keyboard)", lambda: send_cost(fresh_start()), lambda: send_cost(keyboards.START)),
+        ("rps_start / rps_play", lambda: send_cost(fresh_rps()), lambda: send_cost(keyboards.RPS)),
+        ("dice_roll / callback", lambda: send_cost(fresh_dice()), lambda: send_cost(keyboards.DICE_AGAIN)),
+        ("uno hand (cache hit)",
+         lambda: send_cost(fresh_uno_hand(hand)),
+         lambda: send_cost(keyboards.uno_hand(hand))),
+        ("uno hand (5000 distinct)",
+         lambda: send_cost(fresh_uno_hand(hands[next(cycle) % 5000])),
+         lambda: send_cost(keyboards.uno_hand(hands[next(cycle) % 5000]))),
+    ]
+
+    print(f"{'us per send':28}{'fresh':>10}{'registry':>10}{'speedup':>9}")
+    for name, before, after in cases:
+        old, new = per_call_us(before), per_call_us(after)
+        print(f"{name:28}{old:10.2f}{new:10.2f}{old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
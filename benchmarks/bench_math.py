@@ -0,0 +1,92 @@
+"""Math Battle problems per second: the old eval() generator vs the precomputed bank.
+
+Usage: python benchmarks/bench_math.py [--seconds S]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+import math_bank  # noqa: E402
+
+
+def legacy_problem():
+    """The previous generator body, up to (not including) the keyboard."""
+    op = random.choice(['+', '-', '*'])
+    if op == '*':
+        a = random.randint(2, 12)
+        b = random.randint(2, 12)
+    else:
+        a = random.randint(1, 50)
+        b = random.randint(1, 50)
+    question = f"{a} {op} {b}"
+    answer = eval(question)
+    choices = {answer}
+    while len(choices) < 4:
+        offset = random.randint(-10, 10)
+        if offset != 0:
+            choices.add(answer + offset)
+    choices_list = list(choices)
+    random.shuffle(choices_list)
+    return question, answer, choices_list
+
+
+def bank_problem(tier=math_bank.DEFAULT_TIER):
+    index = math_bank.sample(tier)
+    return math_bank.question(index), math_bank.ANSWER[index], math_bank.choices(index)
+
+
+def with_keyboard(generate):
+    def build():
+        question, answer, c = generate()
+        keyboard = [
+            [InlineKeyboardButton(str(c[0]), callback_data=f"math_ans_{c[0]}_{answer}"),
+             InlineKeyboardButton(str(c[1]), callback_data=f"math_ans_{c[1]}_{answer}")],
+            [InlineKeyboardButton(str(c[2]), callback_data=f"math_ans_{c[2]}_{answer}"),
+             InlineKeyboardButton(str(c[3]), callback_data=f"math_ans_{c[3]}_{answer}")],
+        ]
+        return f"`{question} = ?`", InlineKeyboardMarkup(keyboard)
+    return build
+
+
+def rate(func, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            func()
+        count += 100
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"bank: {len(math_bank.ANSWER)} problems, "
+          f"{sum(a.itemsize * len(a) for a in (math_bank.A, math_bank.B, math_bank.OP, math_bank.ANSWER, math_bank.DISTRACTORS))} bytes of arrays")
+    rows = [
+        ("problem only", rate(legacy_problem, args.seconds), rate(bank_problem, args.seconds)),
+        ("problem + keyboard",
+         rate(with_keyboard(legacy_problem), args.seconds),
+         rate(with_keyboard(bank_problem), args.seconds)),
+    ]
+    for tier in math_bank.TIERS:
+        rows.append((f"bank tier {tier}", None, rate(lambda: bank_problem(tier), args.seconds)))
+
+    print(f"{'problems/s':24}{'legacy':>12}{'bank':>12}{'speedup':>9}")
+    for name, old, new in rows:
+        if old is None:
+            print(f"{name:24}{'':>12}{new:12.0f}")
+        else:
+            print(f"{name:24}{old:12.0f}{new:12.0f}{new / old:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
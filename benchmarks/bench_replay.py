@@ -0,0 +1,335 @@
+"""Replay synthetic updates through bot_app.process_update, fully offline.
+
+A fake Bot API server and stub cat/joke endpoints run in a child process on
+127.0.0.1, and bot.py is pointed at them through TELEGRAM_API_URL,
+CAT_API_URL and JOKE_API_URL. Each scenario (a command or a callback button)
+is replayed one update at a time; UNO moves include the bot's deferred reply.
+Reports updates/s, p50/p95/p99 latency and memory allocated per update, and
+optionally writes the results as JSON to track regressions.
+
+Outgoing rate limits are lifted and persistence is off (PERSISTENCE_PATH="")
+unless set in the environment, so the numbers are handler cost only.
+
+Usage: python benchmarks/bench_replay.py [--updates N] [--scenarios a,b] [--json PATH]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+# --- Fake upstreams (child process) ---
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs
+    # add ~40 ms to every call
+    disable_nagle_algorithm = True
+    counter = 0
+
+    def do_GET(self):
+        self._handle({})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        params = {k: v[0] for k, v in parse_qs(body).items()}
+        self._handle(params)
+
+    def _handle(self, params):
+        FakeHandler.counter += 1
+        n = FakeHandler.counter
+        path, _, query = self.path.partition("?")
+        if path == "/cat":
+            limit = int(parse_qs(query).get("limit", ["1"])[0])
+            self._reply([{"id": f"c{n}_{i}", "url": f"https://cdn.example/cat/{n}_{i}.jpg"}
+                         for i in range(limit)])
+        elif path == "/joke":
+            self._reply({"setup": f"Joke setup {n}?", "punchline": f"Punchline number {n}!"})
+        elif path == "/random_ten":
+            self._reply([{"setup": f"Joke setup {n}_{i}?", "punchline": f"Punchline {n}_{i}!"}
+                         for i in range(10)])
+        elif path.startswith("/bot"):
+            self._reply({"ok": True, "result": self._bot_result(path.rsplit("/", 1)[-1], params, n)})
+        else:
+            self.send_error(404)
+
+    @staticmethod
+    def _bot_result(method, params, n):
+        if method == "getMe":
+            return BOT_USER
+        if method.startswith("answer") or method in ("deleteWebhook", "setWebhook"):
+            return True
+        chat_id = json.loads(params.get("chat_id", "1"))
+        message = {
+            "message_id": int(params.get("message_id", n)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        if method == "sendPhoto":
+            message["photo"] = [{"file_id": f"photo{n}", "file_unique_id": f"u{n}",
+                                 "width": 640, "height": 480}]
+        else:
+            message["text"] = params.get("text", "")
+        return message
+
+    def _reply(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port_queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeHandler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+# --- Synthetic updates ---
+class Updates:
+    def __init__(self):
+        self.next_id = 1
+
+    def _ids(self):
+        self.next_id += 1
+        return self.next_id
+
+    def message(self, text, user_id):
+        n = self._ids()
+        command = text.split()[0]
+        return {"update_id": n, "message": {
+            "message_id": n, "date": int(time.time()), "text": text,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        }}
+
+    def callback(self, data, user_id):
+        n = self._ids()
+        return {"update_id": n, "callback_query": {
+            "id": str(n), "chat_instance": "bench", "data": data,
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "message": {"message_id": n, "date": int(time.time()), "text": "...",
+                        "chat": {"id": user_id, "type": "private"}, "from": BOT_USER},
+        }}
+
+
+def build_scenarios(bot, updates):
+    """name -> async factory(user_id) returning the update dict to replay."""
+    from uno import UnoGame, can_play
+
+    def command(text):
+        async def make(user_id):
+            return updates.message(text, user_id)
+        return make
+
+    def button(data):
+        async def make(user_id):
+            return updates.callback(data, user_id)
+        return make
+
+    async def joke_reveal(user_id):
+        token = await bot.callback_store.put("Punchline!")
+        return updates.callback(f"joke_{token}", user_id)
+
+    async def math_answer(user_id):
+        # Always the right answer: the continuous-play path
+        index = bot.math_bank.sample()
+        expires = int(time.time()) + bot.MATH_ANSWER_TTL
+        choices = bot.math_bank.choices(index, bot.math_layout(index, expires))
+        position = choices.index(bot.math_bank.ANSWER[index])
+        return updates.callback(f"math_ans_{bot.math_signer.sign(index, expires, position)}", user_id)
+
+    async def uno_play(user_id):
+        while True:
+            game = UnoGame.deal()
+            playable = [i for i, card in enumerate(game.user_hand) if can_play(card, game.top)]
+            if playable:
+                break
+        bot.bot_app.user_data[user_id]['uno'] = game
+        return updates.callback(f"uno_p_{playable[0]}", user_id)
+
+    async def uno_draw(user_id):
+        bot.bot_app.user_data[user_id]['uno'] = UnoGame.deal()
+        return updates.callback("uno_draw", user_id)
+
+    return {
+        "start": command("/start"),
+        "cat": command("/cat"),
+        "joke": command("/joke"),
+        "math": command("/math"),
+        "rps": command("/rps"),
+        "dice": command("/dice"),
+        "uno": command("/uno"),
+        "cb_joke_reveal": joke_reveal,
+        "cb_math_start": button("math_start"),
+        "cb_math_answer": math_answer,
+        "cb_rps": button("rps_rock"),
+        "cb_roll_dice": button("roll_dice"),
+        "cb_uno_play": uno_play,
+        "cb_uno_draw": uno_draw,
+    }
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+async def replay(bot, make, user_id, count, measure_memory=False):
+    """Feed ``count`` updates; return per-update latencies or memory figures."""
+    from telegram import Update
+
+    latencies = []
+    peaks = []
+    retained = []
+    for _ in range(count):
+        update = Update.de_json(await make(user_id), bot.bot_app.bot)
+        if measure_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        await bot.bot_app.process_update(update)
+        # UNO moves finish in a deferred job: count it as part of the update
+        await bot.scheduler.drain()
+        latencies.append(time.perf_counter() - start)
+        if measure_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    return latencies, peaks, retained
+
+
+async def run(bot, names, args):
+    scenarios = build_scenarios(bot, Updates())
+    errors = {}
+
+    async def count_error(update, context):
+        errors[current] = errors.get(current, 0) + 1
+
+    bot.bot_app.add_error_handler(count_error)
+    await bot.bot_app.initialize()
+    results = {}
+    try:
+        for user_id, current in enumerate(names, start=1000):
+            make = scenarios[current]
+            await replay(bot, make, user_id, args.warmup)
+            errors.pop(current, None)
+
+            started = time.perf_counter()
+            latencies, _, _ = await replay(bot, make, user_id, args.updates)
+            elapsed = time.perf_counter() - started
+
+            tracemalloc.start()
+            _, peaks, retained = await replay(bot, make, user_id, args.memory_updates, True)
+            tracemalloc.stop()
+
+            latencies.sort()
+            results[current] = {
+                "updates": args.updates,
+                "updates_per_sec": args.updates / elapsed,
+                "p50_ms": percentile(latencies, 0.50) * 1e3,
+                "p95_ms": percentile(latencies, 0.95) * 1e3,
+                "p99_ms": percentile(latencies, 0.99) * 1e3,
+                "mean_ms": statistics.fmean(latencies) * 1e3,
+                "alloc_peak_kib": statistics.fmean(peaks) / 1024,
+                "retained_bytes": statistics.fmean(retained),
+                "errors": errors.get(current, 0),
+            }
+    finally:
+        await bot.bot_app.shutdown()
+        await bot.post_shutdown(bot.bot_app)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=500, help="timed updates per scenario")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--memory-updates", type=int, default=100,
+                        help="updates per scenario replayed under tracemalloc")
+    parser.add_argument("--scenarios", help="comma-separated subset (default: all)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(port_queue,), daemon=True)
+    server.start()
+    base = f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+
+    os.environ.update({
+        "TELEGRAM_API_URL": base,
+        "CAT_API_URL": f"{base}/cat",
+        "JOKE_API_URL": f"{base}/joke",
+        "NO_PROXY": "127.0.0.1",
+        "BOT_THINK_DELAY": "0",
+    })
+    for name, value in (("PERSISTENCE_PATH", ""), ("SEND_RATE_GLOBAL", "1e9"),
+                        ("SEND_RATE_CHAT", "1e9"), ("SEND_RATE_GROUP", "1e9"),
+                        ("BOT_TOKEN", "123456:bench")):
+        os.environ.setdefault(name, value)
+
+    import bot
+    logging.getLogger().setLevel(logging.WARNING)
+
+    available = list(build_scenarios(bot, Updates()))
+    names = args.scenarios.split(",") if args.scenarios else available
+    unknown = set(names) - set(available)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    try:
+        results = asyncio.run(run(bot, names, args))
+    finally:
+        server.terminate()
+
+    print(f"{'scenario':16}{'upd/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'KiB/upd':>9}{'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:16}{r['updates_per_sec']:9.0f}{r['p50_ms']:9.2f}{r['p95_ms']:9.2f}"
+              f"{r['p99_ms']:9.2f}{r['alloc_peak_kib']:9.1f}{r['errors']:8}")
+
+    if args.json:
+        report = {
+            "timestamp": time.time(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "settings": {"updates": args.updates, "warmup": args.warmup,
+                         "memory_updates": args.memory_updates},
+            "scenarios": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Throughput of SHARD_WORKERS bot processes behind one ingress.
+
+For each worker count, a ShardSupervisor starts that many bot.py workers and
+this process, acting as the ingress, routes a burst of updates to them by
+chat. The updates are a mix of commands and buttons from many chats, handled
+by the real handlers against fake Bot API / cat / joke servers (one per
+worker, from bench_replay, so the fake server is never the bottleneck).
+Reports updates/s and the speedup over one worker.
+
+Scaling can only be near-linear up to the number of free cores; the script
+prints how many there are.
+
+Usage: python benchmarks/bench_shards.py [--workers 1,2,4] [--updates N] [--chats N] [--json PATH]
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_replay import Updates, serve  # noqa: E402
+from shards import ShardSupervisor  # noqa: E402
+
+# (kind, payload, weight)
+MIX = [
+    ("command", "/start", 20), ("command", "/rps", 15), ("command", "/dice", 15),
+    ("command", "/math", 15), ("command", "/joke", 10), ("command", "/cat", 5),
+    ("button", "rps_rock", 10), ("button", "roll_dice", 5), ("button", "math_start", 5),
+]
+
+
+def worker(base_urls, index, sock):
+    """Shard worker: bot.py pointed at this worker's fake servers."""
+    base = base_urls[index % len(base_urls)]
+    os.environ.update({
+        "TELEGRAM_API_URL": base,
+        "CAT_API_URL": f"{base}/cat",
+        "JOKE_API_URL": f"{base}/joke",
+    })
+    import bot
+    logging.getLogger().setLevel(logging.WARNING)
+    bot.run_shard(index, sock)
+
+
+def make_updates(updates, count, chats):
+    rng = random.Random(0)
+    choices, weights = [(kind, payload) for kind, payload, _ in MIX], [w for *_, w in MIX]
+    burst = []
+    for _ in range(count):
+        kind, payload = rng.choices(choices, weights)[0]
+        chat = 1000 + rng.randrange(chats)
+        make = updates.message if kind == "command" else updates.callback
+        burst.append(make(payload, chat))
+    return burst
+
+
+async def push(supervisor, burst):
+    """Route the burst like the ingress does and wait until every update is handled."""
+    done_before = sum(s["done"] for s in supervisor.stats()["shards"])
+    for data in burst:
+        while supervisor.submit(data) == supervisor.FULL:
+            await asyncio.sleep(0.001)
+    while sum(s["done"] for s in supervisor.stats()["shards"]) - done_before < len(burst):
+        await asyncio.sleep(0.005)
+
+
+async def measure(workers, base_urls, burst, warmup):
+    supervisor = ShardSupervisor(functools.partial(worker, base_urls), workers)
+    await supervisor.start()
+    try:
+        # Worker startup and first-update initialization are not measured
+        await push(supervisor, warmup)
+        start = time.perf_counter()
+        await push(supervisor, burst)
+        elapsed = time.perf_counter() - start
+    finally:
+        await supervisor.stop()
+    return len(burst) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--updates", type=int, default=3000, help="timed updates per run")
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    counts = [int(n) for n in args.workers.split(",")]
+
+    servers, base_urls = [], []
+    port_queue = multiprocessing.Queue()
+    for _ in range(max(counts)):
+        server = multiprocessing.Process(target=serve, args=(port_queue,), daemon=True)
+        server.start()
+        servers.append(server)
+        base_urls.append(f"http://127.0.0.1:{port_queue.get(timeout=10)}")
+
+    # Inherited by the workers
+    os.environ.update({"NO_PROXY": "127.0.0.1", "BOT_THINK_DELAY": "0"})
+    for name, value in (("PERSISTENCE_PATH", ""), ("SEND_RATE_GLOBAL", "1e9"),
+                        ("SEND_RATE_CHAT", "1e9"), ("SEND_RATE_GROUP", "1e9"),
+                        ("BOT_TOKEN", "123456:bench")):
+        os.environ.setdefault(name, value)
+    logging.basicConfig(level=logging.WARNING)
+
+    # One id sequence: the supervisor drops update_ids it has already seen
+    updates = Updates()
+    warmup = make_updates(updates, max(counts) * 20, args.chats)
+    burst = make_updates(updates, args.updates, args.chats)
+    results = {}
+    try:
+        for workers in counts:
+            results[workers] = asyncio.run(measure(workers, base_urls, burst, warmup))
+    finally:
+        for server in servers:
+            server.terminate()
+
+    print(f"cores available: {len(os.sched_getaffinity(0))}")
+    print(f"{'workers':>8}{'upd/s':>10}{'speedup':>9}{'per worker':>12}")
+    baseline = results[counts[0]] / counts[0]
+    for workers, rate in results.items():
+        print(f"{workers:8}{rate:10.0f}{rate / baseline:8.2f}x{rate / workers / baseline:11.0%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"updates": args.updates, "chats": args.chats,
+                       "cores": len(os.sched_getaffinity(0)),
+                       "updates_per_sec": results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Cold start: time to import bot.py and to answer the first update.
+
+Each run starts a fresh interpreter that imports bot and feeds it one update
+through the webhook path (warm_app), against the fake Bot API server and stub
+upstreams from bench_replay. Reported per run:
+
+* import: ``import bot``
+* first update: initialization plus handling the first update
+* process: interpreter launch to first reply, as seen by this script
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--command /start] [--json PATH]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_replay import Updates, serve  # noqa: E402
+
+
+def child(command):
+    start = time.perf_counter()
+    import bot
+    imported = time.perf_counter()
+    bot.warm_app.process(Updates().message(command, 1000))
+    done = time.perf_counter()
+    print(json.dumps({"import": imported - start, "first_update": done - imported}), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--command", default="/start", help="the first update's command")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.command)
+        return
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(port_queue,), daemon=True)
+    server.start()
+    base = f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+    env = dict(
+        os.environ,
+        TELEGRAM_API_URL=base,
+        CAT_API_URL=f"{base}/cat",
+        JOKE_API_URL=f"{base}/joke",
+        NO_PROXY="127.0.0.1",
+    )
+    env.setdefault("PERSISTENCE_PATH", "")
+    env.setdefault("BOT_TOKEN", "123456:bench")
+
+    runs = {"import": [], "first_update": [], "process": []}
+    try:
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            proc = subprocess.Popen(
+                [sys.executable, __file__, "--child", "--command", args.command],
+                cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+            )
+            line = proc.stdout.readline()
+            # Shutting down (atexit) is not part of the cold start
+            runs["process"].append(time.perf_counter() - started)
+            if proc.wait() != 0 or not line:
+                raise RuntimeError("startup run failed")
+            result = json.loads(line)
+            runs["import"].append(result["import"])
+            runs["first_update"].append(result["first_update"])
+    finally:
+        server.terminate()
+
+    summary = {
+        name: {"median_ms": statistics.median(values) * 1e3, "min_ms": min(values) * 1e3}
+        for name, values in runs.items()
+    }
+    print(f"{'':16}{'median ms':>12}{'min ms':>10}")
+    for name, r in summary.items():
+        print(f"{name:16}{r['median_ms']:12.1f}{r['min_ms']:10.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"command": args.command, "runs": args.runs, "results": summary}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
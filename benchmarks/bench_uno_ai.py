@@ -0,0 +1,104 @@
+"""Headless UNO simulation: strategy win rates and game-logic throughput.
+
+Plays every pair of strategies in uno_ai against each other (both seatings)
+and reports win rates and games per second, next to the previous bot logic
+(linear scan of the hand, first matching card).
+
+Usage: python benchmarks/bench_uno_ai.py [--games N] [--seed S]
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uno_ai  # noqa: E402
+from uno import UnoGame, can_play  # noqa: E402
+
+
+def legacy_simulate(rng):
+    """Both players use the previous play_bot_move: first matching card."""
+    game = UnoGame.deal(rng)
+    hands = (game.user_hand, game.bot_hand)
+    top = game.top
+    player = 0
+    passes = 0
+    while passes < 2:
+        hand = hands[player]
+        for i, card in enumerate(hand):
+            if can_play(card, top):
+                top = hand.pop(i)
+                passes = 0
+                break
+        else:
+            if game.deck:
+                hand.append(game.deck.pop())
+                passes = 0
+            else:
+                passes += 1
+            player ^= 1
+            continue
+        if not hand:
+            return player
+        player ^= 1
+    return -1
+
+
+def legacy_pick(hand, top):
+    for card in hand:
+        if can_play(card, top):
+            return card
+    return None
+
+
+def pick_us(samples, pick):
+    start = time.perf_counter()
+    for hand, top in samples:
+        pick(hand, top)
+    return (time.perf_counter() - start) / len(samples) * 1e6
+
+
+def run(play, games, seed):
+    rng = random.Random(seed)
+    results = [0, 0, 0]  # first player wins, second player wins, stuck
+    start = time.perf_counter()
+    for _ in range(games):
+        results[play(rng)] += 1
+    elapsed = time.perf_counter() - start
+    return results, games / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    samples = []
+    for _ in range(args.games):
+        game = UnoGame.deal(rng)
+        samples.append((game.bot_hand, game.top))
+    masks = [(uno_ai.to_mask(hand), top) for hand, top in samples]
+    print(f"move selection (us): legacy {pick_us(samples, legacy_pick):.3f}", end="")
+    for name, strategy in uno_ai.STRATEGIES.items():
+        print(f", {name} {pick_us(masks, lambda hand, top: strategy(hand, top, 0)):.3f}", end="")
+    print("\n")
+
+    print(f"{'first player':16}{'second player':16}{'1st wins':>10}{'2nd wins':>10}"
+          f"{'stuck':>8}{'games/s':>10}")
+
+    def report(a, b, results, per_second):
+        first, second, stuck = (r / args.games * 100 for r in results)
+        print(f"{a:16}{b:16}{first:9.1f}%{second:9.1f}%{stuck:7.1f}%{per_second:10.0f}")
+
+    report("legacy", "legacy", *run(legacy_simulate, args.games, args.seed))
+    for a, b in itertools.product(uno_ai.STRATEGIES, repeat=2):
+        report(a, b, *run(lambda rng: uno_ai.simulate(a, b, rng), args.games, args.seed))
+
+
+if __name__ == "__main__":
+    main()
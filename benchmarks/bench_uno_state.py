@@ -0,0 +1,77 @@
+"""Memory and (de)serialization cost of one UNO game: dict layout vs UnoGame.
+
+Usage: python benchmarks/bench_uno_state.py [--games N]
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uno import COLORS, VALUES, UnoGame  # noqa: E402
+
+
+def deal_dict_game(rng):
+    """The previous layout: lists of {"color": ..., "value": ...} dicts."""
+    deck = [{"color": c, "value": v} for c in COLORS for v in VALUES]
+    rng.shuffle(deck)
+    user_hand = [deck.pop() for _ in range(7)]
+    bot_hand = [deck.pop() for _ in range(7)]
+    return {"deck": deck, "user_hand": user_hand, "bot_hand": bot_hand, "discard": [deck.pop()]}
+
+
+def bytes_per_game(deal, games):
+    rng = random.Random(0)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [deal(rng) for _ in range(games)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / games
+
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    dict_game = deal_dict_game(rng)
+    compact_game = UnoGame.deal(rng)
+    dict_blob = pickle.dumps(dict_game, pickle.HIGHEST_PROTOCOL)
+    compact_blob = compact_game.serialize()
+    compact_pickle = pickle.dumps(compact_game, pickle.HIGHEST_PROTOCOL)
+
+    rows = [
+        ("memory per game (bytes)",
+         bytes_per_game(deal_dict_game, args.games),
+         bytes_per_game(UnoGame.deal, args.games)),
+        ("serialized size (bytes)", len(dict_blob), len(compact_blob)),
+        ("pickled size (bytes)", len(dict_blob), len(compact_pickle)),
+        ("serialize (us)",
+         per_call_us(lambda: pickle.dumps(dict_game, pickle.HIGHEST_PROTOCOL), 20000),
+         per_call_us(compact_game.serialize, 20000)),
+        ("deserialize (us)",
+         per_call_us(lambda: pickle.loads(dict_blob), 20000),
+         per_call_us(lambda: UnoGame.deserialize(compact_blob), 20000)),
+        ("pickle round trip (us)",
+         per_call_us(lambda: pickle.loads(pickle.dumps(dict_game, pickle.HIGHEST_PROTOCOL)), 20000),
+         per_call_us(lambda: pickle.loads(pickle.dumps(compact_game, pickle.HIGHEST_PROTOCOL)), 20000)),
+    ]
+
+    print(f"{'':28}{'dict':>12}{'UnoGame':>12}{'ratio':>8}")
+    for name, old, new in rows:
+        print(f"{name:28}{old:12.2f}{new:12.2f}{old / new:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
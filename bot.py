@@ -1,23 +1,47 @@
 import os
+import json
 import logging
-import asyncio
 import random
-import requests
-from flask import Flask, request
+import tempfile
+import time
 from telegram import (
     Update, 
     InlineKeyboardButton, 
     InlineKeyboardMarkup, 
-    ReplyKeyboardMarkup, 
 )
 from telegram.constants import ParseMode
+from telegram.request import HTTPXRequest
 from telegram.ext import (
     Application, 
     CommandHandler, 
-    CallbackQueryHandler, 
     ContextTypes
 )
 
+from asgi import WebhookASGI
+from callback_store import CallbackStore
+from dispatcher import PerChatUpdateProcessor
+from http_client import UpstreamClient
+from ingest import UpdateIngestQueue
+from lazy import LazyRequest, lazy_module
+from metrics import MetricsRegistry, instrument_handlers
+import keyboards
+from photo_cache import FileIdCache
+from persistence import SQLitePersistence
+from polling import PollingRunner
+from prefetch import PrefetchBuffer
+from ratelimit import SendRateLimiter
+from router import CallbackRouter
+from render import EditRenderer
+from shards import ShardSupervisor, ShardWorker, ShardedPollingRunner, shard_path
+from scheduler import DeferredScheduler
+from signing import CallbackSigner, derive_secret
+from uno import CARD_LABELS, UnoGame, can_play
+import uno_ai
+from warm import WarmApplication
+
+# Loaded on first use (e.g. the first /math), not during a cold start
+math_bank = lazy_module("math_bank")
+
 # 1. Logging Setup (Helps debug issues)
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -29,37 +53,180 @@ logger = logging.getLogger(__name__)
 # Try to get TOKEN from Environment Variable, fallback to your string for local testing if needed
 TOKEN = os.getenv("BOT_TOKEN", "8535828230:AAF71_itHUM4_SzdLXUdneTUCgm_Ba69444") 
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "https://telebot-sepia.vercel.app/")
+CAT_API_URL = os.getenv("CAT_API_URL", "https://api.thecatapi.com/v1/images/search")
+JOKE_API_URL = os.getenv("JOKE_API_URL", "https://official-joke-api.appspot.com/random_joke")
+# Ten random jokes per request; next to JOKE_API_URL unless set
+JOKE_BATCH_URL = os.getenv("JOKE_BATCH_URL", JOKE_API_URL.rsplit("/", 1)[0] + "/random_ten")
+# Root of a self-hosted (or fake, for benchmarks) Bot API server; Telegram's if unset
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+PREFETCH_SIZE = int(os.getenv("PREFETCH_SIZE", "5"))
+PREFETCH_LOW_WATER = int(os.getenv("PREFETCH_LOW_WATER", "2"))
+# Items per upstream request, and requests in flight per source
+PREFETCH_BATCH_SIZE = int(os.getenv("PREFETCH_BATCH_SIZE", "10"))
+PREFETCH_MAX_FETCHES = int(os.getenv("PREFETCH_MAX_FETCHES", "4"))
+# Jokes per JOKE_BATCH_URL response (fixed by the API)
+JOKE_BATCH_SIZE = int(os.getenv("JOKE_BATCH_SIZE", "10"))
+# Recently served jokes and cats kept to serve again while their API is down
+# (circuit breakers: UPSTREAM_BREAKER_* in http_client.py)
+STALE_POOL_SIZE = int(os.getenv("STALE_POOL_SIZE", "50"))
+# Share of /cat replies served from recently sent photos without calling the cat API
+CAT_REUSE_RATIO = float(os.getenv("CAT_REUSE_RATIO", "0.25"))
+CAT_REUSE_MIN_POOL = int(os.getenv("CAT_REUSE_MIN_POOL", "20"))
+PHOTO_CACHE_PATH = os.getenv("PHOTO_CACHE_PATH")  # e.g. /tmp/cat_file_ids.json
+# Where button payloads live; set to a redis:// URL to share them across instances
+CALLBACK_STORE_URL = os.getenv("CALLBACK_STORE_URL")
+CALLBACK_TTL = float(os.getenv("CALLBACK_TTL", str(24 * 3600)))
+# SQLite file for user_data/chat_data (UNO games, streaks); set to "" to disable.
+# Shard workers each use their own copy (telebot.shard0.sqlite3, ...)
+PERSISTENCE_PATH = os.getenv(
+    "PERSISTENCE_PATH", os.path.join(tempfile.gettempdir(), "telebot.sqlite3")
+)
+# Key for signing Math Battle buttons; derived from the bot token if unset
+MATH_SECRET = os.getenv("MATH_SECRET", "").encode() or derive_secret(TOKEN, "math")
+# Seconds a Math Battle problem's answer buttons stay valid
+MATH_ANSWER_TTL = int(os.getenv("MATH_ANSWER_TTL", "600"))
+# Updates handled in parallel (updates of one chat always run in order)
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "32"))
+# "inline": answer the webhook after the update is handled (safe on serverless).
+# "queue": acknowledge at once and handle updates on a background worker pool;
+# only for long-running servers, as serverless instances freeze after replying.
+INGEST_MODE = os.getenv("INGEST_MODE", "inline")
+# "asgi" (default) or "flask" for the legacy Flask app
+WEBHOOK_SERVER = os.getenv("WEBHOOK_SERVER", "asgi")
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "1000"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "16"))
+# Outgoing Bot API calls per second: overall, per private chat, per group
+SEND_RATE_GLOBAL = float(os.getenv("SEND_RATE_GLOBAL", "30"))
+SEND_RATE_CHAT = float(os.getenv("SEND_RATE_CHAT", "1"))
+SEND_RATE_GROUP = float(os.getenv("SEND_RATE_GROUP", str(20 / 60)))
+# Polling mode (`python bot.py`): long-poll wait, updates per getUpdates call,
+# and how many fetched updates may be in flight before fetching pauses
+POLL_TIMEOUT = float(os.getenv("POLL_TIMEOUT", "30"))
+POLL_LIMIT = int(os.getenv("POLL_LIMIT", "100"))
+POLL_MAX_PENDING = int(os.getenv("POLL_MAX_PENDING", "1000"))
+# Bot worker processes, each handling a share of the chats (see shards.py);
+# 1 runs everything in this process. Webhook mode needs the ASGI server.
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "1"))
+# UNO bot strategy: "count_colors" (default), "hold_actions" or "greedy"
+UNO_BOT_STRATEGY = os.getenv("UNO_BOT_STRATEGY", uno_ai.DEFAULT_STRATEGY)
+if UNO_BOT_STRATEGY not in uno_ai.STRATEGIES:
+    # Fail at startup, not on the bot's first UNO turn
+    raise ValueError(
+        f"Unknown UNO_BOT_STRATEGY {UNO_BOT_STRATEGY!r}, "
+        f"expected one of: {', '.join(sorted(uno_ai.STRATEGIES))}"
+    )
+# Visual delay before the UNO bot's move shows up
+BOT_THINK_DELAY = float(os.getenv("BOT_THINK_DELAY", "1.5"))
+# With a delay this short the "thinking" edit is skipped and only the result is
+# shown; the default covers the default delay, so a turn costs one edit
+THINKING_MERGE_WINDOW = float(os.getenv("THINKING_MERGE_WINDOW", "2.0"))
+
+# Prometheus-style metrics, served at /metrics
+metrics = MetricsRegistry()
+handler_seconds = metrics.histogram(
+    "telebot_handler_seconds", "Handler callback duration.", ("handler",)
+)
+handler_outcomes = metrics.counter(
+    "telebot_handler_total", "Handler callbacks by outcome.", ("handler", "outcome")
+)
+upstream_seconds = metrics.histogram(
+    "telebot_upstream_request_seconds", "Content API requests (cat, joke).", ("host", "outcome")
+)
+telegram_seconds = metrics.histogram(
+    "telebot_telegram_request_seconds", "Bot API calls.", ("method", "outcome")
+)
+poll_lag_seconds = metrics.histogram(
+    "telebot_poll_lag_seconds", "Polling mode: time from getUpdates to handler start."
+)
+breaker_state = metrics.gauge(
+    "telebot_upstream_breaker_state", "Circuit state: 0 closed, 1 half open, 2 open.", ("host",)
+)
+breaker_transitions = metrics.counter(
+    "telebot_upstream_breaker_transitions_total", "Circuit state changes.", ("host", "state")
+)
+stale_content = metrics.counter(
+    "telebot_stale_content_total", "Replies served from recent content, API down.", ("source",)
+)
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+def on_breaker_change(host: str, state: str) -> None:
+    breaker_state.labels(host).set(BREAKER_STATE_VALUES[state])
+    breaker_transitions.labels(host, state).inc()
 
-app = Flask(__name__)
+# Shared pooled client for all outbound (non-Telegram) HTTP calls
+http = UpstreamClient.from_env(observe=upstream_seconds.observe, on_breaker_change=on_breaker_change)
+
+
+# Upstream content sources, kept topped up in the background
+# Concurrent /cat and /joke callers share batched fetches of up to n items
+async def fetch_cat_urls(n: int) -> list:
+    data = await http.get_json(CAT_API_URL, params={"limit": n})
+    return [image["url"] for image in data]
+
+async def fetch_jokes(n: int) -> list:
+    # The joke API has no count parameter: this endpoint always returns
+    # JOKE_BATCH_SIZE, and joke_buffer always asks for that many
+    data = await http.get_json(JOKE_BATCH_URL)
+    return [(joke["setup"], joke["punchline"]) for joke in data]
+
+cat_buffer = PrefetchBuffer(
+    "cat", fetch_cat_urls, PREFETCH_SIZE, PREFETCH_LOW_WATER, STALE_POOL_SIZE,
+    PREFETCH_BATCH_SIZE, PREFETCH_MAX_FETCHES,
+)
+joke_buffer = PrefetchBuffer(
+    "joke", fetch_jokes, PREFETCH_SIZE, PREFETCH_LOW_WATER, STALE_POOL_SIZE,
+    JOKE_BATCH_SIZE, PREFETCH_MAX_FETCHES, fixed_batch=True,
+)
+photo_cache = FileIdCache(path=PHOTO_CACHE_PATH)
+callback_store = CallbackStore.from_url(CALLBACK_STORE_URL, ttl=CALLBACK_TTL)
+# Math answer buttons carry (problem index, expiry time, choice position), signed
+math_signer = CallbackSigner(MATH_SECRET, ">HIB", purpose=b"math_ans")
+# Last rendered state of each UNO message, to skip or shrink redundant edits
+uno_view = EditRenderer()
+# Deferred follow-up work (UNO bot moves), run on the bot's event loop. Queue
+# mode means a long-running server; polling and ASGI lifespan turn it on too.
+scheduler = DeferredScheduler(background=INGEST_MODE == "queue")
 
 # 3. Bot Logic Handlers
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /start is issued."""
     user = update.effective_user
-    
-    # Persistent keyboard (at the bottom of chat)
-    reply_keyboard = [
-        ['/joke', '/cat', '/uno'],
-        ['/rps', '/math', '/dice']
-    ]
-    markup = ReplyKeyboardMarkup(reply_keyboard, resize_keyboard=True)
 
+    # Persistent keyboard (at the bottom of chat)
     await update.message.reply_html(
         f"Hi {user.mention_html()}! Choose a function 👇",
-        reply_markup=markup,
+        reply_markup=keyboards.START,
     )
 
 async def cat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Sends random cat image."""
     try:
-        url = "https://api.thecatapi.com/v1/images/search"
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
-        data = resp.json()
-        cat_image_url = data[0]["url"]
+        if not update.message:
+            return
+
+        # Resend a recently seen cat by file_id now and then (no cat API call, no download)
+        if random.random() < CAT_REUSE_RATIO:
+            file_id = photo_cache.pick_recent(CAT_REUSE_MIN_POOL)
+            if file_id:
+                await update.message.reply_photo(photo=file_id)
+                return
 
-        if update.message:
-            await update.message.reply_photo(photo=cat_image_url)
+        try:
+            cat_image_url = await cat_buffer.get()
+        except Exception:
+            # Cat API down or its circuit open: a recent cat beats an apology
+            recent = photo_cache.pick_recent() or cat_buffer.stale()
+            if recent is None:
+                raise
+            stale_content.labels("cat").inc()
+            await update.message.reply_photo(photo=recent)
+            return
+
+        file_id = photo_cache.get(cat_image_url)
+        message = await update.message.reply_photo(photo=file_id or cat_image_url)
+        if not file_id and message.photo:
+            # Remember what Telegram stored so the next send skips the download
+            photo_cache.put(cat_image_url, message.photo[-1].file_id)
             
     except Exception as e:
         logger.error(f"Error fetching cat: {e}")
@@ -69,16 +236,19 @@ async def cat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 async def joke(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Fetches a random joke setup."""
     try:
-        url = "https://official-joke-api.appspot.com/random_joke"
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
-        data = resp.json()
-
-        setup_text = data["setup"]
-        punchline = data["punchline"]
-
-        # Note: Callback data has a 64-byte limit. Long punchlines might fail here.
-        keyboard = [[InlineKeyboardButton("Reveal", callback_data=f"joke_{punchline}")]]
+        try:
+            setup_text, punchline = await joke_buffer.get()
+        except Exception:
+            # Joke API down or its circuit open: retell a recent joke
+            recent = joke_buffer.stale()
+            if recent is None:
+                raise
+            stale_content.labels("joke").inc()
+            setup_text, punchline = recent
+
+        # Callback data has a 64-byte limit, so the punchline stays server-side
+        token = await callback_store.put(punchline)
+        keyboard = [[InlineKeyboardButton("Reveal", callback_data=f"joke_{token}")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
         await update.message.reply_text(setup_text, reply_markup=reply_markup)
@@ -86,55 +256,53 @@ async def joke(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         logger.error(f"Error fetching joke: {e}")
         await update.message.reply_text("Failed to fetch a joke.")
 
-async def joke_reveal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Reveals the punchline."""
+async def joke_reveal(update: Update, context: ContextTypes.DEFAULT_TYPE, token: str) -> None:
+    """Reveals the punchline (button data: "joke_TOKEN")."""
     query = update.callback_query
+
+    punchline = await callback_store.get(token)
+    if punchline is None:
+        await query.answer("This joke has expired. Try /joke again!")
+        return
+
     await query.answer()
-    
-    # Extract punchline from callback_data (format: "joke_PUNCHLINE")
-    punchline = query.data.split("joke_", 1)[1]
     await query.edit_message_text(punchline)
 
 # --- Math Battle Logic ---
-async def generate_math_problem():
-    """Helper to generate question and keyboard."""
-    ops = ['+', '-', '*']
-    op = random.choice(ops)
-    
-    if op == '*':
-        a = random.randint(2, 12)
-        b = random.randint(2, 12)
-    else:
-        a = random.randint(1, 50)
-        b = random.randint(1, 50)
-        
-    question = f"{a} {op} {b}"
-    answer = eval(question)
-    
-    choices = {answer}
-    while len(choices) < 4:
-        offset = random.randint(-10, 10)
-        if offset != 0:
-            choices.add(answer + offset)
-    
-    choices_list = list(choices)
-    random.shuffle(choices_list)
-    
+def math_layout(index: int, expires: int) -> int:
+    """The problem's choice layout. Keyed, so decoding the buttons' tokens
+    (index, expires, position) doesn't tell which one holds the answer."""
+    return math_signer.derive(index, expires) % len(math_bank.CHOICE_ORDERS)
+
+def generate_math_problem(tier=None):
+    """Helper to generate question and keyboard (sampled from the precomputed bank)."""
+    index = math_bank.sample(tier or math_bank.DEFAULT_TIER)
+    # Tokens are signed, not encrypted: a button only says which position was
+    # picked, and only the server knows the layout. No state is kept: the
+    # signed expiry bounds how long a button works, and answering edits the
+    # buttons away, so a correct button can't be pressed again.
+    expires = int(time.time()) + MATH_ANSWER_TTL
+    choices_list = math_bank.choices(index, math_layout(index, expires))
+
     keyboard = [
         [
-            InlineKeyboardButton(str(choices_list[0]), callback_data=f"math_ans_{choices_list[0]}_{answer}"),
-            InlineKeyboardButton(str(choices_list[1]), callback_data=f"math_ans_{choices_list[1]}_{answer}")
+            InlineKeyboardButton(str(choices_list[0]), callback_data=f"math_ans_{math_signer.sign(index, expires, 0)}"),
+            InlineKeyboardButton(str(choices_list[1]), callback_data=f"math_ans_{math_signer.sign(index, expires, 1)}")
         ],
         [
-            InlineKeyboardButton(str(choices_list[2]), callback_data=f"math_ans_{choices_list[2]}_{answer}"),
-            InlineKeyboardButton(str(choices_list[3]), callback_data=f"math_ans_{choices_list[3]}_{answer}")
+            InlineKeyboardButton(str(choices_list[2]), callback_data=f"math_ans_{math_signer.sign(index, expires, 2)}"),
+            InlineKeyboardButton(str(choices_list[3]), callback_data=f"math_ans_{math_signer.sign(index, expires, 3)}")
         ]
     ]
-    return f"🧠 **Math Battle** 🧠\n\nSolve this:\n`{question} = ?`", InlineKeyboardMarkup(keyboard)
+    return f"🧠 **Math Battle** 🧠\n\nSolve this:\n`{math_bank.question(index)} = ?`", InlineKeyboardMarkup(keyboard)
 
 async def math_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Generates a math problem and 4 options."""
-    text, reply_markup = await generate_math_problem()
+    """Generates a math problem and 4 options. `/math easy|medium|hard|mixed` sets the difficulty."""
+    if context.args and context.args[0].lower() in math_bank.TIERS:
+        context.user_data['math_tier'] = context.args[0].lower()
+    text, reply_markup = generate_math_problem(
+        context.user_data.get('math_tier', math_bank.DEFAULT_TIER)
+    )
     
     if update.callback_query:
         await update.callback_query.answer()
@@ -146,18 +314,28 @@ async def math_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN
         )
 
-async def math_check(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Checks the answer. If correct, immediately gives a new question."""
+async def math_check(update: Update, context: ContextTypes.DEFAULT_TYPE, fields):
+    """Checks the answer. If correct, immediately gives a new question.
+
+    ``fields`` are the values signed into the button ("math_ans_TOKEN"), or
+    None if the token didn't verify.
+    """
     query = update.callback_query
+    
+    if fields is None or fields[1] < time.time():
+        await query.answer("This button is no longer valid. Try /math again!")
+        return
     await query.answer()
     
-    data = query.data.split("_")
-    selected = int(data[2])
-    actual = int(data[3])
+    index, expires, position = fields
+    selected = math_bank.choices(index, math_layout(index, expires))[position]
+    actual = math_bank.ANSWER[index]
     
     if selected == actual:
         # Correct! Generate new question immediately for continuous play
-        text, reply_markup = await generate_math_problem()
+        text, reply_markup = generate_math_problem(
+            context.user_data.get('math_tier', math_bank.DEFAULT_TIER)
+        )
         # Add a small success indicator to the top of the next question
         new_text = f"✅ **Correct!**\n\n{text}"
         await query.edit_message_text(
@@ -168,15 +346,16 @@ async def math_check(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         # Wrong! End the streak and show play again button
         result_text = f"❌ **Wrong!**\nYou chose {selected}. The answer was {actual}."
-        keyboard = [[InlineKeyboardButton("🔄 Try Again", callback_data="math_start")]]
         
         await query.edit_message_text(
             result_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=keyboards.MATH_TRY_AGAIN,
             parse_mode=ParseMode.MARKDOWN
         )
 
 # --- Rock Paper Scissors Logic ---
+RPS_CHOICES = ("rock", "paper", "scissors")
+
 def get_winner(user_choice: str, bot_choice: str) -> str:
     if user_choice == bot_choice:
         return "tie"
@@ -189,25 +368,21 @@ def get_winner(user_choice: str, bot_choice: str) -> str:
     return "bot"
 
 async def rps_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [
-            InlineKeyboardButton("🪨 Rock", callback_data="rps_rock"),
-            InlineKeyboardButton("📄 Paper", callback_data="rps_paper"),
-        ],
-        [InlineKeyboardButton("✂️ Scissors", callback_data="rps_scissors")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text(
         "👊 **Rock Paper Scissors** 👊\nChoose!",
-        reply_markup=reply_markup
+        reply_markup=keyboards.RPS
     )
 
-async def rps_play(update: Update, context: ContextTypes.DEFAULT_TYPE):
+def parse_rps_choice(choice: str) -> tuple:
+    if choice not in RPS_CHOICES:
+        raise ValueError(choice)
+    return (choice,)
+
+async def rps_play(update: Update, context: ContextTypes.DEFAULT_TYPE, user_choice: str):
     query = update.callback_query
     await query.answer()
 
-    user_choice = query.data.split("_")[1]
-    bot_choice = random.choice(["rock", "paper", "scissors"])
+    bot_choice = random.choice(RPS_CHOICES)
     winner = get_winner(user_choice, bot_choice)
     
     emojis = {"rock": "🪨", "paper": "📄", "scissors": "✂️"}
@@ -226,118 +401,111 @@ async def rps_play(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     # Re-use the same keyboard for replay
-    keyboard = [
-        [
-            InlineKeyboardButton("🪨 Rock", callback_data="rps_rock"),
-            InlineKeyboardButton("📄 Paper", callback_data="rps_paper"),
-        ],
-        [InlineKeyboardButton("✂️ Scissors", callback_data="rps_scissors")],
-    ]
-
     await query.edit_message_text(
         text, 
-        reply_markup=InlineKeyboardMarkup(keyboard), 
+        reply_markup=keyboards.RPS, 
     )
 
 async def dice_roll(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Rolls a 6-sided die."""
     result = random.randint(1, 6)
-    keyboard = [[InlineKeyboardButton("Roll Again 🎲", callback_data="roll_dice")]]
-    await update.message.reply_text(f"🎲 You rolled a {result}!", reply_markup=InlineKeyboardMarkup(keyboard))
+    await update.message.reply_text(f"🎲 You rolled a {result}!", reply_markup=keyboards.DICE_AGAIN)
 
 async def dice_roll_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Callback for rolling dice again."""
     query = update.callback_query
     await query.answer()
     result = random.randint(1, 6)
-    keyboard = [[InlineKeyboardButton("Roll Again 🎲", callback_data="roll_dice")]]
-    await query.edit_message_text(f"🎲 You rolled a {result}!", reply_markup=InlineKeyboardMarkup(keyboard))
-
-COLORS = ['🔴', '🟡', '🟢', '🔵']
-VALUES = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'Skip', 'Draw2']
-
-def create_deck():
-    return [{"color": c, "value": v} for c in COLORS for v in VALUES]
-
-def can_play(card, top_card):
-    return card['color'] == top_card['color'] or card['value'] == top_card['value']
+    await query.edit_message_text(f"🎲 You rolled a {result}!", reply_markup=keyboards.DICE_AGAIN)
 
 # --- HANDLERS ---
 async def start_uno(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Starts a new UNO game vs a Bot."""
-    deck = create_deck()
-    random.shuffle(deck)
-    
-    # Initial Deal
-    user_hand = [deck.pop() for _ in range(7)]
-    bot_hand = [deck.pop() for _ in range(7)]
-    discard_pile = [deck.pop()]
-    
-    # Save game state in user_data
-    context.user_data['uno'] = {
-        'deck': deck,
-        'user_hand': user_hand,
-        'bot_hand': bot_hand,
-        'discard': discard_pile
-    }
+    # A bot move still pending belongs to the previous game
+    context.user_data.pop('uno_bot_pending', None)
+    scheduler.cancel(update.effective_user.id)
+    # Shuffle and deal; the game is saved in user_data
+    context.user_data['uno'] = UnoGame.deal()
     
     await send_uno_board(update, context)
 
-async def send_uno_board(update, context, text_prefix=""):
-    """Renders the current game state and the user's hand."""
-    game = context.user_data['uno']
-    top_card = game['discard'][-1]
-    
+def render_uno_board(game, text_prefix=""):
+    """Builds the board text and the user's hand as buttons."""
     text = (
         f"{text_prefix}\n"
-        f"🤖 Bot Cards: {len(game['bot_hand'])}\n"
-        f"🃏 Top Card: **{top_card['color']} {top_card['value']}**\n"
+        f"🤖 Bot Cards: {len(game.bot_hand)}\n"
+        f"🃏 Top Card: **{CARD_LABELS[game.top]}**\n"
         f"--- --- --- ---\n"
         f"Your Turn! Pick a card to play:"
     )
     
-    # Build the player's hand as buttons
-    keyboard = []
-    row = []
-    for i, card in enumerate(game['user_hand']):
-        row.append(InlineKeyboardButton(f"{card['color']}{card['value']}", callback_data=f"uno_p_{i}"))
-        if len(row) == 3: # 3 cards per row
-            keyboard.append(row)
-            row = []
-    if row: keyboard.append(row)
-    
-    # Add a Draw button
-    keyboard.append([InlineKeyboardButton("📥 Draw a Card", callback_data="uno_draw")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    # The player's hand as buttons (cached per hand)
+    return text, keyboards.uno_hand(bytes(game.user_hand))
+
+async def send_uno_board(update, context, text_prefix=""):
+    """Renders the current game state and the user's hand."""
+    text, reply_markup = render_uno_board(context.user_data['uno'], text_prefix)
     
     if update.callback_query:
-        await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+        message = update.callback_query.message
+        await uno_view.edit(context.bot, message.chat.id, message.message_id, text, reply_markup, "Markdown")
     else:
-        await update.message.reply_text(text, reply_markup=reply_markup, parse_mode="Markdown")
-
-async def uno_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        message = await update.message.reply_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+        uno_view.remember(message.chat.id, message.message_id, text, reply_markup)
+
+def parse_uno_card(index: str) -> tuple:
+    """Button data "uno_p_3": play the card at index 3 of the hand."""
+    idx = int(index)
+    if idx < 0:
+        raise ValueError(index)
+    return ("play", idx)
+
+async def uno_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, action: str, idx: int = None):
+    """Hand buttons: action is "play" (card ``idx``), "draw" or "wait"."""
     query = update.callback_query
-    data = query.data
     game = context.user_data.get('uno')
     
-    if not game:
+    # (games saved before the compact UnoGame format can't be resumed)
+    if not isinstance(game, UnoGame):
         await query.answer("No active game. Start with /uno")
         return
 
+    # --- BOT STILL TO MOVE ---
+    # uno_bot_pending is the message_id of the board the move belongs to
+    pending = context.user_data.get('uno_bot_pending')
+    if pending is not None and pending != query.message.message_id:
+        # Left over from another board (an older game): forget it
+        del context.user_data['uno_bot_pending']
+        pending = None
+    if pending is not None:
+        if scheduler.pending(update.effective_user.id):
+            await query.answer("🤖 Bot is still thinking...")
+            return
+        # The scheduled move was lost with a recycled process: play it now
+        await query.answer()
+        await finish_bot_turn(
+            context.application, update.effective_user.id,
+            query.message.chat.id, query.message.message_id,
+        )
+        return
+
     await query.answer()
 
     # --- PLAYER PLAYING A CARD ---
-    if data.startswith("uno_p_"):
-        idx = int(data.split("_")[-1])
-        selected_card = game['user_hand'][idx]
-        top_card = game['discard'][-1]
-
-        if can_play(selected_card, top_card):
-            game['discard'].append(game['user_hand'].pop(idx))
+    if action == "play":
+        if idx >= len(game.user_hand):
+            # Stale button from an older board
+            return
+        selected_card = game.user_hand[idx]
+
+        if can_play(selected_card, game.top):
+            game.discard.append(game.user_hand.pop(idx))
             
-            if not game['user_hand']:
-                await query.edit_message_text("🎉 **YOU WIN!** You played your last card.", parse_mode="Markdown")
+            if not game.user_hand:
+                await uno_view.edit(
+                    context.bot, query.message.chat.id, query.message.message_id,
+                    "🎉 **YOU WIN!** You played your last card.", parse_mode="Markdown",
+                )
                 context.user_data['uno'] = None
                 return
             
@@ -346,78 +514,256 @@ async def uno_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer("❌ That card doesn't match!", show_alert=True)
 
     # --- PLAYER DRAWING A CARD ---
-    elif data == "uno_draw":
-        if game['deck']:
-            game['user_hand'].append(game['deck'].pop())
+    elif action == "draw":
+        if game.deck:
+            game.user_hand.append(game.deck.pop())
             await bot_turn(update, context)
         else:
             await query.answer("Deck is empty!")
 
 async def bot_turn(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """The Bot's logic: Play the first matching card it finds."""
-    game = context.user_data['uno']
-    top_card = game['discard'][-1]
-    
-    # Visual delay so the user can see what's happening
-    await update.callback_query.edit_message_text("🤖 Bot is thinking...")
-    await asyncio.sleep(1.5)
-
-    played = False
-    for i, card in enumerate(game['bot_hand']):
-        if can_play(card, top_card):
-            game['discard'].append(game['bot_hand'].pop(i))
-            bot_msg = f"🤖 Bot played {card['color']} {card['value']}!"
-            played = True
-            break
-    
-    if not played:
-        if game['deck']:
-            game['bot_hand'].append(game['deck'].pop())
-            bot_msg = "🤖 Bot had no match and drew a card."
-        else:
-            bot_msg = "🤖 Bot had no match (Deck empty)."
+    """Shows that the bot is thinking and schedules its move.
+
+    With a long-running runner the move is a deferred job, so the update
+    finishes right away instead of sleeping through the visual delay. On a
+    serverless webhook it is played before the request returns. If the move
+    comes soon enough, the "thinking" edit is merged into the final one.
+    """
+    query = update.callback_query
+    if BOT_THINK_DELAY > THINKING_MERGE_WINDOW:
+        await uno_view.edit(
+            context.bot, query.message.chat.id, query.message.message_id,
+            "🤖 Bot is thinking...", keyboards.UNO_WAITING,
+        )
 
-    if not game['bot_hand']:
-        await update.callback_query.edit_message_text("💀 **BOT WINS!** Better luck next time.", parse_mode="Markdown")
-        context.user_data['uno'] = None
+    user_id = update.effective_user.id
+    context.user_data['uno_bot_pending'] = query.message.message_id
+    await scheduler.defer(
+        BOT_THINK_DELAY, finish_bot_turn,
+        context.application, user_id, query.message.chat.id, query.message.message_id,
+        key=user_id,
+    )
+
+def play_bot_move(game):
+    """The Bot's logic: play the card picked by UNO_BOT_STRATEGY, or draw."""
+    card = uno_ai.pick_card(game, UNO_BOT_STRATEGY)
+    if card is not None:
+        game.bot_hand.remove(card)
+        game.discard.append(card)
+        return f"🤖 Bot played {CARD_LABELS[card]}!"
+
+    if game.deck:
+        game.bot_hand.append(game.deck.pop())
+        return "🤖 Bot had no match and drew a card."
+    return "🤖 Bot had no match (Deck empty)."
+
+async def finish_bot_turn(application, user_id, chat_id, message_id):
+    """Deferred job: applies the bot's move and shows the new board."""
+    user_data = application.user_data[user_id]
+    # Skip if the move was already played or belongs to another board
+    if user_data.get('uno_bot_pending') != message_id:
+        return
+    del user_data['uno_bot_pending']
+    game = user_data.get('uno')
+    if not isinstance(game, UnoGame):
+        return
+
+    bot_msg = play_bot_move(game)
+    if not game.bot_hand:
+        await uno_view.edit(
+            application.bot, chat_id, message_id,
+            "💀 **BOT WINS!** Better luck next time.", parse_mode="Markdown",
+        )
+        user_data['uno'] = None
     else:
-        await send_uno_board(update, context, text_prefix=bot_msg)
+        text, reply_markup = render_uno_board(game, text_prefix=bot_msg)
+        await uno_view.edit(application.bot, chat_id, message_id, text, reply_markup, "Markdown")
+
+    # Runs outside an update, so hand the new state to the persistence ourselves
+    if application.persistence:
+        application.mark_data_for_update_persistence(user_ids=user_id)
+        await application.update_persistence()
 
 
 # 4. Initialize Application
-bot_app = Application.builder().token(TOKEN).build()
+async def post_stop(application: Application) -> None:
+    """Finish queued updates and pending bot moves before the bot shuts down."""
+    await ingest.drain()
+    await scheduler.drain()
+
+async def post_shutdown(application: Application) -> None:
+    """Stop background refills and release pooled upstream connections."""
+    await cat_buffer.aclose()
+    await joke_buffer.aclose()
+    await http.aclose()
+    await callback_store.aclose()
+    photo_cache.save()
+    if application.persistence:
+        await application.persistence.close()
+
+builder = (
+    Application.builder()
+    .token(TOKEN)
+    # Only polling opens this connection; webhook instances never build it
+    .get_updates_request(LazyRequest(lambda: HTTPXRequest(connection_pool_size=1)))
+    .concurrent_updates(PerChatUpdateProcessor(MAX_CONCURRENT_UPDATES))
+    # Each shard worker sends to its own chats only, with an equal share of
+    # the global limit
+    .rate_limiter(SendRateLimiter(
+        SEND_RATE_GLOBAL / SHARD_WORKERS, SEND_RATE_CHAT, SEND_RATE_GROUP,
+        observe=telegram_seconds.observe,
+    ))
+    .post_stop(post_stop)
+    .post_shutdown(post_shutdown)
+)
+if TELEGRAM_API_URL:
+    builder.base_url(f"{TELEGRAM_API_URL}/bot").base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+if PERSISTENCE_PATH:
+    builder.persistence(SQLitePersistence(PERSISTENCE_PATH, update_interval=5))
+bot_app = builder.build()
 
 # Add Handlers
+# Inline buttons: one lookup on callback_data, arguments parsed once. Checked
+# before the commands, as most updates are button presses.
+callback_router = CallbackRouter()
+callback_router.add("joke_", joke_reveal)
+callback_router.add("math_start", math_start)
+callback_router.add("math_ans_", math_check, parse=lambda token: (math_signer.verify(token),))
+callback_router.add("rps_", rps_play, parse=parse_rps_choice)
+callback_router.add("roll_dice", dice_roll_callback)
+callback_router.add("uno_p_", uno_callback, parse=parse_uno_card)
+callback_router.add("uno_draw", uno_callback, args=("draw",))
+callback_router.add("uno_wait", uno_callback, args=("wait",))
+bot_app.add_handler(callback_router)
+
 bot_app.add_handler(CommandHandler("start", start))
 bot_app.add_handler(CommandHandler("cat", cat))
 bot_app.add_handler(CommandHandler("joke", joke))
-bot_app.add_handler(CallbackQueryHandler(joke_reveal, pattern="^joke_"))
 bot_app.add_handler(CommandHandler("math", math_start))
-bot_app.add_handler(CallbackQueryHandler(math_start, pattern="^math_start$"))
-bot_app.add_handler(CallbackQueryHandler(math_check, pattern="^math_ans_"))
 bot_app.add_handler(CommandHandler("rps", rps_start))
-bot_app.add_handler(CallbackQueryHandler(rps_play, pattern="^rps_"))
 bot_app.add_handler(CommandHandler("dice", dice_roll))
-bot_app.add_handler(CallbackQueryHandler(dice_roll_callback, pattern="^roll_dice$"))    
 bot_app.add_handler(CommandHandler("uno", start_uno))
-bot_app.add_handler(CallbackQueryHandler(uno_callback, pattern="^uno_"))
-
-# 5. Flask Routes (For Vercel/Webhooks)
-@app.route('/', methods=['GET', 'POST'])
-async def webhook():
-    """Handle incoming Telegram updates via Webhook"""
-    if request.method == "POST":
-        await bot_app.initialize()
-        update = Update.de_json(request.get_json(force=True), bot_app.bot)
-        await bot_app.process_update(update)
-        await bot_app.shutdown()
-        
-        return "OK", 200
-    return "Bot is running!", 200
+instrument_handlers(bot_app, handler_seconds, handler_outcomes)
+
+def run_shard(index: int, sock) -> None:
+    """Entry point of a shard worker process."""
+    scheduler.background = True
+    if PERSISTENCE_PATH:
+        # Not opened yet (loading is lazy): each shard keeps its own file
+        bot_app.persistence = SQLitePersistence(
+            shard_path(PERSISTENCE_PATH, index), update_interval=5
+        )
+    ShardWorker(bot_app, sock, POLL_MAX_PENDING, observe_lag=poll_lag_seconds.observe).run()
+
+# Polling runner, used when run as a script
+if SHARD_WORKERS > 1:
+    shard_supervisor = ShardSupervisor(run_shard, SHARD_WORKERS, POLL_MAX_PENDING)
+    poller = ShardedPollingRunner(
+        bot_app, shard_supervisor, POLL_TIMEOUT, POLL_LIMIT, POLL_MAX_PENDING
+    )
+else:
+    shard_supervisor = None
+    poller = PollingRunner(
+        bot_app, POLL_TIMEOUT, POLL_LIMIT, POLL_MAX_PENDING, observe_lag=poll_lag_seconds.observe
+    )
+
+# Initialized lazily on the first update and reused for the life of the process
+warm_app = WarmApplication(bot_app)
+ingest = UpdateIngestQueue(warm_app, INGEST_QUEUE_SIZE, INGEST_WORKERS)
+
+def collect_stats() -> dict:
+    """Lifecycle stats of this warm instance (cold start time, updates served)."""
+    stats = warm_app.stats()
+    stats["prefetch"] = {"cat": cat_buffer.stats(), "joke": joke_buffer.stats()}
+    stats["photo_cache"] = photo_cache.stats()
+    stats["upstream_breakers"] = http.stats()
+    stats["scheduler"] = scheduler.stats()
+    stats["uno_render"] = uno_view.stats()
+    stats["rate_limiter"] = bot_app.bot.rate_limiter.stats()
+    stats["dispatcher"] = bot_app.update_processor.stats()
+    stats["ingest"] = ingest.stats()
+    if poller.batches:
+        stats["polling"] = poller.stats()
+    elif shard_supervisor:
+        stats["shards"] = shard_supervisor.stats()
+    return stats
+
+async def asgi_startup() -> None:
+    # Lifespan events mean a long-running server: the loop outlives requests
+    scheduler.background = True
+    if shard_supervisor:
+        await shard_supervisor.start()
+
+# 5. Webhook Server (For Vercel/Webhooks)
+# Native ASGI app: handles updates on the same event loop as bot_app.
+# Run locally with e.g. `uvicorn bot:app`.
+# With shard workers, updates are acknowledged at once and routed to them.
+asgi_app = WebhookASGI(
+    warm_app,
+    shard_supervisor or ingest,
+    queue_mode=INGEST_MODE == "queue" or shard_supervisor is not None,
+    get_routes={
+        "/stats": lambda: (200, "application/json", json.dumps(collect_stats())),
+        "/metrics": lambda: (200, MetricsRegistry.CONTENT_TYPE, metrics.render()),
+    },
+    on_startup=asgi_startup,
+    on_shutdown=shard_supervisor and shard_supervisor.stop,
+)
+
+# Flask compatibility shim (WEBHOOK_SERVER=flask). Flask is only imported
+# when this app is actually used.
+def create_flask_app():
+    from flask import Flask, request, jsonify
+
+    flask_app = Flask(__name__)
+
+    @flask_app.route('/', methods=['GET', 'POST'])
+    def webhook():
+        """Handle incoming Telegram updates via Webhook"""
+        if request.method == "POST":
+            data = request.get_json(force=True, silent=True)
+            if INGEST_MODE != "queue":
+                if not isinstance(data, dict):
+                    return "Bad update", 400
+                warm_app.process(data)
+                return "OK", 200
+
+            status = ingest.submit(data)
+            if status == ingest.INVALID:
+                return "Bad update", 400
+            if status == ingest.FULL:
+                # Shed load; Telegram redelivers the update later
+                return "Busy", 429, {"Retry-After": "1"}
+            return "OK", 200
+        return "Bot is running!", 200
+
+    @flask_app.route('/stats', methods=['GET'])
+    def stats():
+        return jsonify(collect_stats()), 200
+
+    @flask_app.route('/metrics', methods=['GET'])
+    def metrics_route():
+        return metrics.render(), 200, {"Content-Type": MetricsRegistry.CONTENT_TYPE}
+
+    return flask_app
+
+def __getattr__(name):
+    # `bot.flask_app` is built on first access
+    if name == "flask_app":
+        globals()["flask_app"] = create_flask_app()
+        return globals()["flask_app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Vercel serves whatever is bound to `app`
+if WEBHOOK_SERVER == "flask":
+    app = flask_app = create_flask_app()
+else:
+    app = asgi_app
 
 
 # 6. Execution Logic
 if __name__ == "__main__":
     # Local Development: Use Polling
     print("Starting bot in POLLING mode...")
-    bot_app.run_polling()
\ No newline at end of file
+    scheduler.background = True
+    poller.run()
\ No newline at end of file
@@ -0,0 +1,116 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"circuit for {name} is open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Stops calling an upstream that keeps failing, for a cool-down period.
+
+    * closed: calls go through. ``failure_threshold`` failures in a row open
+      the circuit. A call slower than ``slow_call`` seconds counts as a
+      failure even if it succeeded, so a degraded upstream trips it too.
+    * open: :meth:`check` raises CircuitOpenError at once, for
+      ``reset_timeout`` seconds.
+    * half_open: one trial call goes through; its result closes the circuit
+      or opens it again. Other calls keep failing fast meanwhile.
+
+    The caller reports every call it was allowed to make with :meth:`record`,
+    passing the admission time :meth:`check` returned. Calls admitted before
+    the circuit last opened don't count while it is open or half-open: a
+    success arriving late from one says nothing about the upstream now.
+    ``on_change(name, state)``, if given, is called on every transition.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    __slots__ = ("name", "failure_threshold", "slow_call", "reset_timeout", "on_change",
+                 "state", "failures", "opened_at", "_trial_at", "rejected", "opened")
+
+    def __init__(self, name: str, failure_threshold: int = 5, slow_call: float = 2.0,
+                 reset_timeout: float = 30.0, on_change=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.on_change = on_change
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_at = None
+
+        self.rejected = 0
+        self.opened = 0
+
+    def check(self) -> float:
+        """Raise CircuitOpenError unless a call may go out now.
+
+        Returns the call's admission time, to pass back to :meth:`record`.
+        """
+        now = time.monotonic()
+        if self.state == self.CLOSED:
+            return now
+        if self.state == self.OPEN:
+            retry_in = self.opened_at + self.reset_timeout - now
+            if retry_in > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, retry_in)
+            self._set(self.HALF_OPEN)
+        # A trial that never reported back (e.g. cancelled) is given up on
+        # after reset_timeout
+        if self._trial_at is not None and now - self._trial_at < self.reset_timeout:
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self._trial_at + self.reset_timeout - now)
+        self._trial_at = now
+        return now
+
+    def record(self, admitted: float, seconds: float, ok: bool) -> None:
+        """Report the outcome of a call that :meth:`check` let through at ``admitted``."""
+        if self.state != self.CLOSED and admitted < self.opened_at:
+            # Only the half-open trial (or a later call) may close or reopen it
+            return
+        ok = ok and seconds <= self.slow_call
+        if ok:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._set(self.CLOSED)
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.failures >= self.failure_threshold
+        ):
+            self.opened += 1
+            self.opened_at = time.monotonic()
+            self._set(self.OPEN)
+
+    def _set(self, state: str) -> None:
+        previous, self.state = self.state, state
+        self._trial_at = None
+        if state == self.OPEN:
+            logger.warning(
+                f"Circuit for {self.name} opened after {self.failures} failures "
+                f"({previous} -> open), failing fast for {self.reset_timeout:.0f}s"
+            )
+        else:
+            logger.info(f"Circuit for {self.name}: {previous} -> {state}")
+        if self.on_change:
+            self.on_change(self.name, state)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,98 @@
+import json
+import logging
+import secrets
+import time
+from collections import OrderedDict
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # Only needed for the shared multi-instance backend
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Per-process token store: O(1) get/set, TTL expiry and LRU size bound."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    async def get(self, token: str):
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            del self._entries[token]
+            return None
+        return payload
+
+    async def set(self, token: str, payload: str, ttl: float) -> None:
+        self._entries[token] = (time.monotonic() + ttl, payload)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def aclose(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared token store so any instance can resolve a button another one sent."""
+
+    def __init__(self, url: str, prefix: str = "cb:"):
+        if redis is None:
+            raise RuntimeError("RedisBackend requires the 'redis' package")
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+
+    async def get(self, token: str):
+        value = await self._client.get(self.prefix + token)
+        return value.decode() if value is not None else None
+
+    async def set(self, token: str, payload: str, ttl: float) -> None:
+        # Milliseconds: ex=int(ttl) would cut fractional TTLs short, and Redis
+        # rejects an expiry of 0
+        await self._client.set(self.prefix + token, payload, px=max(1, round(ttl * 1000)))
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class CallbackStore:
+    """Keeps callback payloads server-side behind short opaque tokens.
+
+    Telegram limits ``callback_data`` to 64 bytes, so handlers register the
+    payload with :meth:`put` and put only the returned token in the button.
+    The callback handler resolves it again with :meth:`get`.
+    """
+
+    def __init__(self, backend=None, ttl: float = 24 * 3600, token_bytes: int = 6):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.token_bytes = token_bytes
+
+    @classmethod
+    def from_url(cls, url: str = None, **kwargs) -> "CallbackStore":
+        """In-memory store by default, or a shared one for a ``redis://`` URL."""
+        if url:
+            return cls(RedisBackend(url), **kwargs)
+        return cls(**kwargs)
+
+    async def put(self, payload) -> str:
+        token = secrets.token_urlsafe(self.token_bytes)
+        await self.backend.set(token, json.dumps(payload), self.ttl)
+        return token
+
+    async def get(self, token: str):
+        """Return the payload for ``token``, or None if it is unknown or expired."""
+        value = await self.backend.get(token)
+        return json.loads(value) if value is not None else None
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
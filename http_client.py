@@ -0,0 +1,166 @@
+import asyncio
+import functools
+import logging
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from breaker import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: the upstream may well answer the next attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_EXCEPTIONS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+class UpstreamClient:
+    """Shared, non-blocking HTTP client for handlers that fetch external content.
+
+    One pooled keep-alive ``httpx.AsyncClient`` is used per process. Each host
+    gets its own connection limit so a slow upstream can't starve the others,
+    and failed requests are retried with exponential backoff plus full jitter.
+    Awaiting a request only suspends the calling handler; every other update
+    keeps running on the event loop.
+
+    With a ``breaker`` factory, each host also gets a CircuitBreaker: while
+    it is open, requests to that host raise CircuitOpenError at once instead
+    of waiting for timeouts. Every attempt is reported to it, so a host that
+    keeps failing or answering slowly trips it.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        connect_timeout: float = 2.0,
+        max_connections: int = 50,
+        per_host_limit: int = 10,
+        retries: int = 2,
+        backoff: float = 0.2,
+        observe=None,
+        breaker=None,
+    ):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=30.0,
+        )
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff = backoff
+        # Optional observe(seconds, host, outcome) hook called for every attempt
+        self.observe = observe
+        # Optional breaker(host) -> CircuitBreaker factory
+        self.breaker = breaker
+        self._client = None
+        self._host_slots = {}
+        self._breakers = {}
+
+    @classmethod
+    def from_env(cls, on_breaker_change=None, **kwargs) -> "UpstreamClient":
+        """Build a client configured by the UPSTREAM_* environment variables.
+
+        UPSTREAM_BREAKER_FAILURES=0 turns the circuit breakers off.
+        """
+        failures = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+        if failures > 0:
+            kwargs.setdefault("breaker", functools.partial(
+                CircuitBreaker,
+                failure_threshold=failures,
+                slow_call=float(os.getenv("UPSTREAM_BREAKER_SLOW", "2")),
+                reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET", "30")),
+                on_change=on_breaker_change,
+            ))
+        return cls(
+            timeout=float(os.getenv("UPSTREAM_TIMEOUT", "5")),
+            connect_timeout=float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "2")),
+            max_connections=int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "50")),
+            per_host_limit=int(os.getenv("UPSTREAM_PER_HOST_LIMIT", "10")),
+            retries=int(os.getenv("UPSTREAM_RETRIES", "2")),
+            backoff=float(os.getenv("UPSTREAM_BACKOFF", "0.2")),
+            **kwargs,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the loop that actually runs the handlers
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return slot
+
+    def breaker_for(self, host: str):
+        """The host's CircuitBreaker (None without a breaker factory)."""
+        if self.breaker is None:
+            return None
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = self.breaker(host)
+        return breaker
+
+    def _delay(self, attempt: int) -> float:
+        """Full jitter: a random delay up to the exponential backoff cap."""
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET ``url``, retrying transient failures. Raises on the final failure."""
+        host = urlsplit(url).netloc
+        breaker = self.breaker_for(host)
+        attempt = 0
+        while True:
+            if breaker is not None:
+                try:
+                    admitted = breaker.check()
+                except CircuitOpenError:
+                    if self.observe:
+                        self.observe(0.0, host, "circuit_open")
+                    raise
+            try:
+                async with self._slot(host):
+                    start = time.perf_counter()
+                    try:
+                        resp = await self.client.get(url, **kwargs)
+                    except Exception as e:
+                        seconds = time.perf_counter() - start
+                        if self.observe:
+                            self.observe(seconds, host, type(e).__name__)
+                        if breaker is not None:
+                            breaker.record(admitted, seconds, False)
+                        raise
+                    seconds = time.perf_counter() - start
+                    if self.observe:
+                        self.observe(seconds, host, str(resp.status_code))
+                    if breaker is not None:
+                        breaker.record(admitted, seconds, resp.status_code not in RETRY_STATUSES)
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    resp.raise_for_status()
+                    return resp
+                logger.warning(f"Upstream {url} returned {resp.status_code}, retrying")
+            except RETRY_EXCEPTIONS as e:
+                if attempt >= self.retries:
+                    raise
+                logger.warning(f"Upstream {url} failed ({e!r}), retrying")
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+    async def get_json(self, url: str, **kwargs):
+        resp = await self.get(url, **kwargs)
+        return resp.json()
+
+    def stats(self) -> dict:
+        return {host: breaker.stats() for host, breaker in self._breakers.items()}
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._host_slots.clear()
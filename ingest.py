@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class RecentUpdateIds:
+    """The last ``size`` update_ids accepted, to drop Telegram's redeliveries."""
+
+    __slots__ = ("size", "_ids", "_order")
+
+    def __init__(self, size: int = 10000):
+        self.size = size
+        self._ids = set()
+        self._order = deque()
+
+    def __contains__(self, update_id) -> bool:
+        return update_id in self._ids
+
+    def add(self, update_id: int) -> None:
+        self._ids.add(update_id)
+        self._order.append(update_id)
+        if len(self._order) > self.size:
+            self._ids.discard(self._order.popleft())
+
+
+class UpdateIngestQueue:
+    """Accepts raw webhook updates at once and processes them in the background.
+
+    :meth:`submit` is called from the web server's threads. It validates the
+    update, drops update_ids already seen in the last ``dedup_window`` updates
+    (Telegram redelivers on retries) and puts the update on a bounded queue.
+    It never waits for the handlers. When the queue is full the update is shed
+    and the caller should answer 429, so Telegram retries later. A pool of
+    ``workers`` tasks on the bot's event loop drains the queue through the
+    warm Application.
+    """
+
+    ACCEPTED = "accepted"
+    DUPLICATE = "duplicate"
+    INVALID = "invalid"
+    FULL = "full"
+
+    def __init__(self, warm_app, maxsize: int = 1000, workers: int = 16,
+                 dedup_window: int = 10000):
+        self.warm_app = warm_app
+        self.maxsize = maxsize
+        self.workers = workers
+        self.dedup_window = dedup_window
+
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._seen = RecentUpdateIds(dedup_window)
+        self._queue = None
+        self._tasks = []
+
+        # Metrics
+        self.accepted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.shed = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.last_wait = None
+        self._wait_total = 0.0
+
+    def submit(self, data) -> str:
+        """Queue one update; returns one of ACCEPTED, DUPLICATE, INVALID or FULL."""
+        update_id = data.get("update_id") if isinstance(data, dict) else None
+        if not isinstance(update_id, int):
+            self.invalid += 1
+            return self.INVALID
+
+        with self._lock:
+            if update_id in self._seen:
+                self.duplicates += 1
+                return self.DUPLICATE
+            if self._depth >= self.maxsize:
+                self.shed += 1
+                return self.FULL
+            self._seen.add(update_id)
+            self._depth += 1
+            self.max_depth = max(self.max_depth, self._depth)
+            self.accepted += 1
+
+        self.warm_app.loop.call_soon_threadsafe(self._put, data, time.perf_counter())
+        return self.ACCEPTED
+
+    def _put(self, data: dict, enqueued_at: float) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [
+                asyncio.get_running_loop().create_task(self._worker())
+                for _ in range(self.workers)
+            ]
+        self._queue.put_nowait((data, enqueued_at))
+
+    async def _worker(self) -> None:
+        while True:
+            data, enqueued_at = await self._queue.get()
+            wait = time.perf_counter() - enqueued_at
+            with self._lock:
+                self._depth -= 1
+            self.last_wait = wait
+            self._wait_total += wait
+            try:
+                await self.warm_app.process_update_json(data)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to process queued update {data.get('update_id')}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def drain(self) -> None:
+        """Wait for everything queued so far, then stop the workers."""
+        if self._queue is None:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._queue = None
+        self._tasks = []
+
+    def stats(self) -> dict:
+        taken = self.processed + self.failed
+        return {
+            "depth": self._depth,
+            "max_depth": self.max_depth,
+            "maxsize": self.maxsize,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "shed": self.shed,
+            "processed": self.processed,
+            "failed": self.failed,
+            "last_wait_seconds": self.last_wait,
+            "avg_wait_seconds": self._wait_total / taken if taken else None,
+        }
@@ -0,0 +1,72 @@
+import json
+from functools import lru_cache
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+from uno import BUTTON_LABELS
+
+
+class PreparedMarkup(str):
+    """A reply markup serialized to JSON once, ready to be sent many times.
+
+    python-telegram-bot passes ``str`` request parameters through unchanged,
+    so sending a PreparedMarkup skips both ``to_dict()`` and JSON encoding.
+    The original markup object stays available as :attr:`markup`.
+    """
+
+    markup = None
+
+
+def prepare(markup) -> PreparedMarkup:
+    prepared = PreparedMarkup(json.dumps(markup.to_dict()))
+    prepared.markup = markup
+    return prepared
+
+
+# --- Static keyboards (built once at import) ---
+# Persistent keyboard (at the bottom of chat)
+START = prepare(ReplyKeyboardMarkup(
+    [
+        ['/joke', '/cat', '/uno'],
+        ['/rps', '/math', '/dice']
+    ],
+    resize_keyboard=True,
+))
+
+RPS = prepare(InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🪨 Rock", callback_data="rps_rock"),
+        InlineKeyboardButton("📄 Paper", callback_data="rps_paper"),
+    ],
+    [InlineKeyboardButton("✂️ Scissors", callback_data="rps_scissors")],
+]))
+
+DICE_AGAIN = prepare(InlineKeyboardMarkup(
+    [[InlineKeyboardButton("Roll Again 🎲", callback_data="roll_dice")]]
+))
+
+MATH_TRY_AGAIN = prepare(InlineKeyboardMarkup(
+    [[InlineKeyboardButton("🔄 Try Again", callback_data="math_start")]]
+))
+
+# Keeps a button on the "thinking" message so a lost bot move can be resumed
+UNO_WAITING = prepare(InlineKeyboardMarkup(
+    [[InlineKeyboardButton("⏳ Waiting for bot...", callback_data="uno_wait")]]
+))
+
+
+# --- Parametrized keyboards (memoized on their inputs) ---
+@lru_cache(maxsize=2048)
+def uno_hand(hand: bytes) -> PreparedMarkup:
+    """The player's hand as buttons, 3 cards per row, plus a Draw button."""
+    keyboard = []
+    row = []
+    for i, card in enumerate(hand):
+        row.append(InlineKeyboardButton(BUTTON_LABELS[card], callback_data=f"uno_p_{i}"))
+        if len(row) == 3:
+            keyboard.append(row)
+            row = []
+    if row:
+        keyboard.append(row)
+    keyboard.append([InlineKeyboardButton("📥 Draw a Card", callback_data="uno_draw")])
+    return prepare(InlineKeyboardMarkup(keyboard))
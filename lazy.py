@@ -0,0 +1,61 @@
+import importlib.util
+import sys
+
+from telegram.request import BaseRequest
+
+
+def lazy_module(name: str):
+    """Import ``name`` without running it until one of its attributes is used.
+
+    Cold starts only pay for modules that the first update actually needs.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class LazyRequest(BaseRequest):
+    """A BaseRequest that builds the real one (``factory()``) on first use.
+
+    Used for the getUpdates connection, which a webhook deployment never
+    opens: building an HTTPXRequest sets up an SSL context and a client.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._request = None
+
+    @property
+    def request(self) -> BaseRequest:
+        if self._request is None:
+            self._request = self._factory()
+        return self._request
+
+    @property
+    def read_timeout(self):
+        return self.request.read_timeout
+
+    async def initialize(self) -> None:
+        if self._request is not None:
+            await self._request.initialize()
+
+    async def shutdown(self) -> None:
+        if self._request is not None:
+            await self._request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE,
+                         connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        request = self.request
+        await request.initialize()
+        return await request.do_request(
+            url, method, request_data, read_timeout, write_timeout, connect_timeout, pool_timeout
+        )
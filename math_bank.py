@@ -0,0 +1,81 @@
+import itertools
+import random
+from array import array
+
+# Every (a, op, b) combination of the Math Battle ranges, built once at import.
+# Problem i is (A[i], OPS[OP[i]], B[i]) with answer ANSWER[i]; its three wrong
+# choices are DISTRACTORS[3 * i:3 * i + 3].
+OPS = ('+', '-', '*')
+ADD_SUB_RANGE = range(1, 51)
+MUL_RANGE = range(2, 13)
+DISTRACTOR_OFFSETS = [o for o in range(-10, 11) if o != 0]
+# Orders in which the answer and its distractors can be laid out
+CHOICE_ORDERS = tuple(itertools.permutations(range(4)))
+
+A = array('B')
+B = array('B')
+OP = array('B')
+ANSWER = array('h')
+DISTRACTORS = array('h')
+# Index pools per operator
+BY_OP = {op: array('H') for op in OPS}
+
+
+def _build(rng):
+    for op_index, op in enumerate(OPS):
+        operands = MUL_RANGE if op == '*' else ADD_SUB_RANGE
+        for a in operands:
+            for b in operands:
+                answer = a + b if op == '+' else a - b if op == '-' else a * b
+                BY_OP[op].append(len(ANSWER))
+                A.append(a)
+                B.append(b)
+                OP.append(op_index)
+                ANSWER.append(answer)
+                DISTRACTORS.extend(answer + o for o in rng.sample(DISTRACTOR_OFFSETS, 3))
+
+
+# Fixed seed: every instance builds the same bank, so a problem index (as
+# carried in signed callbacks) means the same problem everywhere.
+_build(random.Random(0))
+
+
+def _pool(predicate):
+    return array('H', (i for i in range(len(ANSWER)) if predicate(i)))
+
+
+# A tier is a tuple of index pools: sampling picks a pool uniformly, then a
+# problem in it. "mixed" matches the original generator (each operator 1/3).
+TIERS = {
+    'easy': (
+        _pool(lambda i: OP[i] == 0 and A[i] <= 20 and B[i] <= 20),
+        _pool(lambda i: OP[i] == 1 and A[i] <= 20 and ANSWER[i] >= 0),
+    ),
+    'medium': (BY_OP['+'], _pool(lambda i: OP[i] == 1 and ANSWER[i] >= 0)),
+    'hard': (BY_OP['*'], _pool(lambda i: OP[i] == 1 and ANSWER[i] < 0)),
+    'mixed': (BY_OP['+'], BY_OP['-'], BY_OP['*']),
+}
+DEFAULT_TIER = 'mixed'
+
+
+def sample(tier: str = DEFAULT_TIER, rng=random) -> int:
+    """Pick a random problem index from ``tier`` in O(1)."""
+    pools = TIERS[tier]
+    pool = pools[rng.randrange(len(pools))]
+    return pool[rng.randrange(len(pool))]
+
+
+def question(index: int) -> str:
+    return f"{A[index]} {OPS[OP[index]]} {B[index]}"
+
+
+def choices(index: int, order: int = None, rng=random) -> tuple:
+    """The answer and its three distractors, laid out in CHOICE_ORDERS[order].
+
+    A random order is used if none is given. Passing the same ``order`` again
+    reproduces the same layout, so it can be recovered from a callback.
+    """
+    d = 3 * index
+    options = (ANSWER[index], DISTRACTORS[d], DISTRACTORS[d + 1], DISTRACTORS[d + 2])
+    order = CHOICE_ORDERS[rng.randrange(24) if order is None else order]
+    return (options[order[0]], options[order[1]], options[order[2]], options[order[3]])
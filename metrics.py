@@ -0,0 +1,166 @@
+import functools
+import time
+from bisect import bisect_left
+
+from telegram.ext import ApplicationHandlerStop
+
+# Upper bounds in seconds; one extra bucket catches everything above (+Inf)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+_CHILD_TYPES = {"counter": Counter, "gauge": Gauge}
+
+
+class MetricFamily:
+    """A named metric with one child per combination of label values.
+
+    Children are created on first use and then reused, so hot paths can look
+    one up once (:meth:`labels`) and update it without allocating.
+    """
+
+    def __init__(self, name: str, description: str, kind: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = Histogram(self.buckets) if self.kind == "histogram" else _CHILD_TYPES[self.kind]()
+            self._children[values] = child
+        return child
+
+    def observe(self, value: float, *labels) -> None:
+        self.labels(*labels).observe(value)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_labelset(pairs)} {child.value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_pairs = pairs + [f'le="{le}"']
+                lines.append(f"{self.name}_bucket{_labelset(bucket_pairs)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labelset(pairs)} {child.sum}")
+            lines.append(f"{self.name}_count{_labelset(pairs)} {child.count}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labelset(pairs) -> str:
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the Prometheus text format."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._families = []
+
+    def histogram(self, name: str, description: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> MetricFamily:
+        family = MetricFamily(name, description, "histogram", labelnames, buckets)
+        self._families.append(family)
+        return family
+
+    def counter(self, name: str, description: str, labelnames=()) -> MetricFamily:
+        family = MetricFamily(name, description, "counter", labelnames)
+        self._families.append(family)
+        return family
+
+    def gauge(self, name: str, description: str, labelnames=()) -> MetricFamily:
+        family = MetricFamily(name, description, "gauge", labelnames)
+        self._families.append(family)
+        return family
+
+    def render(self) -> str:
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+def instrument_handlers(application, seconds: MetricFamily, outcomes: MetricFamily) -> None:
+    """Time every registered handler callback and count its outcomes.
+
+    ``seconds`` is labelled by handler name, ``outcomes`` by handler name and
+    "ok"/"error". Call once, after all handlers are added.
+    """
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if hasattr(handler, "wrap_callbacks"):
+                # Routers (see router.CallbackRouter) time each route separately
+                handler.wrap_callbacks(lambda callback: _timed(callback, seconds, outcomes))
+            else:
+                handler.callback = _timed(handler.callback, seconds, outcomes)
+
+
+def _timed(callback, seconds: MetricFamily, outcomes: MetricFamily):
+    name = callback.__name__
+    histogram = seconds.labels(name)
+    ok = outcomes.labels(name, "ok")
+    error = outcomes.labels(name, "error")
+
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args):
+        start = time.perf_counter()
+        outcome = error
+        try:
+            result = await callback(update, context, *args)
+            outcome = ok
+            return result
+        except ApplicationHandlerStop:
+            outcome = ok
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+            outcome.inc()
+
+    return wrapper
@@ -0,0 +1,259 @@
+import abc
+import asyncio
+import logging
+import pickle
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindPersistence(BasePersistence):
+    """Base for stores that load data lazily and write it back in batches.
+
+    * Nothing is loaded at startup: a user's (or chat's) data is read the first
+      time an update for them arrives, through ``refresh_user_data``. A failed
+      load is retried by the next update. Which keys were loaded is kept for
+      the ``max_loaded`` most recent ones per kind; an older key is loaded
+      again, unless a write for it is still pending.
+    * ``update_*`` calls only serialize the data into a pending batch. The
+      batch is committed ``write_delay`` seconds later in one transaction, so a
+      burst of callbacks costs one commit instead of one per callback.
+    * :meth:`flush` waits until everything written so far is committed. It
+      joins the pending batch instead of forcing its own commit.
+
+    Subclasses implement the blocking storage calls :meth:`_load`,
+    :meth:`_load_all` and :meth:`_write`. They always run on one worker thread,
+    in submission order.
+    """
+
+    def __init__(self, store_data: PersistenceInput = None, update_interval: float = 60,
+                 write_delay: float = 0.02, max_loaded: int = 10000):
+        super().__init__(
+            store_data=store_data or PersistenceInput(callback_data=False),
+            update_interval=update_interval,
+        )
+        self.write_delay = write_delay
+        self.max_loaded = max_loaded
+        self._jobs = queue.SimpleQueue()
+        self._worker = None
+        self._loaded = {"user": OrderedDict(), "chat": OrderedDict()}
+        self._pending = {}
+        self._batch = None
+        self._inflight = None
+
+    # --- Storage primitives (run on the worker thread) ---
+    @abc.abstractmethod
+    def _load(self, kind: str, key):
+        """Return the stored blob for (kind, key), or None."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _load_all(self, kind: str) -> dict:
+        """Return {key: blob} for every stored entry of ``kind``."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _write(self, batch: dict) -> None:
+        """Apply {(kind, key): blob or None} in a single transaction (None deletes)."""
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+    # --- Worker thread ---
+    # A plain thread rather than a ThreadPoolExecutor: executors stop accepting
+    # work when interpreter shutdown begins, before the final flush at exit.
+    def _work(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            loop, future, func, args = job
+            try:
+                result = func(*args)
+            except Exception as e:
+                loop.call_soon_threadsafe(_resolve, future, None, e)
+            else:
+                loop.call_soon_threadsafe(_resolve, future, result, None)
+
+    async def _run(self, func, *args):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, name="persistence", daemon=True)
+            self._worker.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._jobs.put((loop, future, func, args))
+        return await future
+
+    # --- Batching ---
+    def _queue(self, kind: str, key, blob) -> None:
+        self._pending[(kind, key)] = blob
+        if self._batch is None:
+            loop = asyncio.get_running_loop()
+            self._batch = loop.create_future()
+            loop.call_later(self.write_delay, lambda: loop.create_task(self._commit()))
+
+    async def _commit(self) -> None:
+        batch, self._pending = self._pending, {}
+        done, self._batch = self._batch, None
+        self._inflight = done
+        try:
+            await self._run(self._write, batch)
+        except Exception as e:
+            logger.error(f"Persistence write of {len(batch)} entries failed: {e}")
+        finally:
+            if self._inflight is done:
+                self._inflight = None
+            done.set_result(len(batch))
+
+    async def flush(self) -> None:
+        """Wait until every write queued so far has been committed."""
+        pending = self._batch or self._inflight
+        if pending is not None:
+            await asyncio.shield(pending)
+
+    async def close(self) -> None:
+        await self.flush()
+        await self._run(self._close)
+        if self._worker is not None:
+            self._jobs.put(None)
+            self._worker = None
+
+    # --- Lazy loading ---
+    async def _refresh(self, kind: str, key, data: dict) -> None:
+        loaded = self._loaded[kind]
+        loading = loaded.get(key)
+        if loading is not None:
+            loaded.move_to_end(key)
+            if not loading.done():
+                # Another update for the same key is loading it into the same dict
+                await loading
+            return
+
+        loading = loaded[key] = asyncio.ensure_future(self._run(self._load, kind, key))
+        if len(loaded) > self.max_loaded:
+            loaded.popitem(last=False)
+        try:
+            blob = await loading
+        except Exception:
+            # Not marked as loaded, or the data written back would replace
+            # the stored data with an empty dict
+            if loaded.get(key) is loading:
+                del loaded[key]
+            raise
+        # (A pending write means the dict is newer than the store)
+        if blob is not None and (kind, key) not in self._pending:
+            data.update(pickle.loads(blob))
+
+    async def get_user_data(self) -> dict:
+        return {}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        await self._refresh("user", user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        await self._refresh("chat", chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def get_bot_data(self) -> dict:
+        blob = await self._run(self._load, "bot", 0)
+        return pickle.loads(blob) if blob is not None else {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        blobs = await self._run(self._load_all, f"conv:{name}")
+        return {pickle.loads(key): pickle.loads(blob) for key, blob in blobs.items()}
+
+    # --- Write-behind updates ---
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._queue("user", user_id, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._queue("chat", chat_id, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    async def update_bot_data(self, data: dict) -> None:
+        self._queue("bot", 0, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        blob = None if new_state is None else pickle.dumps(new_state)
+        self._queue(f"conv:{name}", pickle.dumps(key), blob)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._loaded["user"].pop(user_id, None)
+        self._queue("user", user_id, None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._loaded["chat"].pop(chat_id, None)
+        self._queue("chat", chat_id, None)
+
+
+def _resolve(future: asyncio.Future, result, exc) -> None:
+    if future.cancelled():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+class SQLitePersistence(WriteBehindPersistence):
+    """Single-file store for local runs and single-instance deployments."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS data ("
+                " kind TEXT NOT NULL, key BLOB NOT NULL, value BLOB NOT NULL,"
+                " PRIMARY KEY (kind, key))"
+            )
+        return self._conn
+
+    def _load(self, kind: str, key):
+        row = self.conn.execute(
+            "SELECT value FROM data WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _load_all(self, kind: str) -> dict:
+        rows = self.conn.execute("SELECT key, value FROM data WHERE kind = ?", (kind,))
+        return dict(rows.fetchall())
+
+    def _write(self, batch: dict) -> None:
+        upserts = [(kind, key, blob) for (kind, key), blob in batch.items() if blob is not None]
+        deletes = [(kind, key) for (kind, key), blob in batch.items() if blob is None]
+        with self.conn:
+            if upserts:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO data (kind, key, value) VALUES (?, ?, ?)", upserts
+                )
+            if deletes:
+                self.conn.executemany("DELETE FROM data WHERE kind = ? AND key = ?", deletes)
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
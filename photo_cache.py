@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class FileIdCache:
+    """LRU map from remote photo URL to the Telegram ``file_id`` of its first send.
+
+    Once Telegram has downloaded a photo, resending its ``file_id`` costs no
+    download on either side. Recently sent photos are also kept in a small pool
+    so a handler can resend one without contacting the upstream API at all.
+    The map can optionally be persisted to a JSON file so a restart keeps the
+    warm set.
+    """
+
+    def __init__(self, maxsize: int = 500, pool_size: int = 50, path: str = None,
+                 save_every: int = 20):
+        self.maxsize = maxsize
+        self.path = path
+        self.save_every = save_every
+        self._file_ids = OrderedDict()
+        self._recent = deque(maxlen=pool_size)
+        self._unsaved = 0
+        # Saves run on executor threads: one at a time, and never an older
+        # snapshot over a newer one
+        self._save_lock = threading.Lock()
+        self._snapshots = 0
+        self._written = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._file_ids)
+
+    def get(self, url: str):
+        """Return the cached file_id for ``url`` (or None), refreshing its LRU slot."""
+        file_id = self._file_ids.get(url)
+        if file_id is None:
+            self.misses += 1
+            return None
+        self._file_ids.move_to_end(url)
+        self.hits += 1
+        return file_id
+
+    def put(self, url: str, file_id: str) -> None:
+        if url in self._file_ids:
+            self._file_ids.move_to_end(url)
+        self._file_ids[url] = file_id
+        self._recent.append(file_id)
+        while len(self._file_ids) > self.maxsize:
+            self._file_ids.popitem(last=False)
+
+        self._unsaved += 1
+        if self.path and self._unsaved >= self.save_every:
+            self._save_in_background()
+
+    def pick_recent(self, min_pool: int = 1):
+        """Random file_id from the recently sent pool, if it holds at least ``min_pool``."""
+        if len(self._recent) < max(min_pool, 1):
+            return None
+        return random.choice(self._recent)
+
+    # --- Persistence ---
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable photo cache {self.path}: {e}")
+            return
+        for url, file_id in list(data.items())[-self.maxsize:]:
+            self._file_ids[url] = file_id
+            self._recent.append(file_id)
+
+    def save(self) -> None:
+        """Atomically write the cache (oldest first, so LRU order survives a reload)."""
+        if self.path:
+            self._write(*self._snapshot())
+
+    def _snapshot(self):
+        self._unsaved = 0
+        self._snapshots += 1
+        return self._snapshots, dict(self._file_ids)
+
+    def _write(self, version: int, snapshot: dict) -> None:
+        with self._save_lock:
+            if version < self._written:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not save photo cache {self.path}: {e}")
+                return
+            self._written = version
+
+    def _save_in_background(self) -> None:
+        version, snapshot = self._snapshot()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(version, snapshot)
+            return
+        loop.run_in_executor(None, self._write, version, snapshot)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._file_ids),
+            "pool": len(self._recent),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
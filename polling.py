@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import signal
+import time
+
+from telegram.error import Conflict, InvalidToken, NetworkError, RetryAfter, TimedOut
+
+from ratelimit import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+class PollingRunner:
+    """Long-polling loop that replaces ``Application.run_polling``.
+
+    * Fetches up to ``limit`` updates per ``getUpdates`` call, waiting up to
+      ``timeout`` seconds for new ones (long poll).
+    * Hands each update to the application's update processor right away, so
+      updates run concurrently while each chat keeps its order (see
+      dispatcher.PerChatUpdateProcessor). At most ``max_pending`` updates are
+      in flight; fetching pauses while the bot is that far behind.
+    * Acknowledges a whole batch at once: the next ``getUpdates`` call carries
+      the offset past the last fetched update.
+    * On SIGTERM/SIGINT, stops fetching, finishes every update already fetched,
+      then confirms the final offset before shutting down. Updates that were
+      not fetched yet stay on Telegram's side and are delivered next time.
+
+    ``observe_lag(seconds)``, if given, receives the time each update waited
+    between being fetched and its handler starting.
+    """
+
+    SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+    def __init__(self, application, timeout: float = 30, limit: int = 100, max_pending: int = 1000,
+                 allowed_updates=None, observe_lag=None, log_every: float = 60):
+        self.application = application
+        self.timeout = timeout
+        self.limit = limit
+        self.max_pending = max_pending
+        self.allowed_updates = allowed_updates
+        self.observe_lag = observe_lag
+        self.log_every = log_every
+        self.offset = None
+
+        self._capacity = None
+        self._tasks = set()
+        self._stopping = None
+        self._fetch = None
+
+        self.batches = 0
+        self.fetched = 0
+        self.started = 0
+        self.handled = 0
+        self.fetch_errors = 0
+        self.last_lag = None
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+
+    def run(self) -> None:
+        """Run until SIGTERM/SIGINT (blocking)."""
+        asyncio.run(self.arun())
+
+    async def arun(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._capacity = asyncio.Semaphore(self.max_pending)
+        self._stopping = asyncio.Event()
+        for sig in self.SIGNALS:
+            loop.add_signal_handler(sig, self.stop)
+        try:
+            await self._open()
+            try:
+                await self._poll()
+            finally:
+                await self._drain()
+        finally:
+            await self._close()
+            for sig in self.SIGNALS:
+                loop.remove_signal_handler(sig)
+
+    async def _open(self) -> None:
+        app = self.application
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        # getUpdates is refused while a webhook is set (bookkeeping, so it
+        # yields to replies)
+        await app.bot.delete_webhook(rate_limit_args={"priority": PRIORITY_BACKGROUND})
+        await app.start()
+
+    async def _close(self) -> None:
+        app = self.application
+        if app.running:
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+    def stop(self) -> None:
+        """Stop fetching; updates already fetched are still handled."""
+        logger.info("Polling stops: finishing fetched updates")
+        self._stopping.set()
+        if self._fetch is not None:
+            # An interrupted getUpdates confirms nothing, so nothing is lost
+            self._fetch.cancel()
+
+    async def _poll(self) -> None:
+        failures = 0
+        logged_at = time.monotonic()
+        while not self._stopping.is_set():
+            if self.log_every and time.monotonic() - logged_at >= self.log_every:
+                logger.info(f"Polling stats: {self.stats()}")
+                logged_at = time.monotonic()
+            self._fetch = asyncio.ensure_future(self._get_updates())
+            try:
+                updates = await self._fetch
+                failures = 0
+            except asyncio.CancelledError:
+                if self._stopping.is_set():
+                    return
+                raise
+            except InvalidToken:
+                raise
+            except RetryAfter as e:
+                self.fetch_errors += 1
+                await self._pause(e.retry_after.total_seconds()
+                                  if hasattr(e.retry_after, "total_seconds") else e.retry_after)
+                continue
+            except (NetworkError, TimedOut, Conflict) as e:
+                # Conflict: another poller (or a webhook) is active for this token
+                self.fetch_errors += 1
+                failures += 1
+                logger.warning(f"getUpdates failed ({e!r}), retrying")
+                await self._pause(min(30.0, 0.5 * 2 ** failures))
+                continue
+            finally:
+                self._fetch = None
+
+            if not updates:
+                continue
+            self.batches += 1
+            self.fetched += len(updates)
+            await self._dispatch(updates, time.monotonic())
+            self.offset = self._update_id(updates[-1]) + 1
+
+    async def _get_updates(self) -> list:
+        return await self.application.bot.get_updates(
+            offset=self.offset, limit=self.limit, timeout=self.timeout,
+            allowed_updates=self.allowed_updates,
+        )
+
+    @staticmethod
+    def _update_id(update) -> int:
+        return update.update_id
+
+    async def _dispatch(self, updates: list, fetched_at: float) -> None:
+        for update in updates:
+            await self._capacity.acquire()
+            task = asyncio.create_task(self._handle(update, fetched_at))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _pause(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _handle(self, update, fetched_at: float) -> None:
+        app = self.application
+        try:
+            await app.update_processor.process_update(update, self._process(update, fetched_at))
+        except Exception as e:
+            logger.error(f"Update {update.update_id} failed: {e}")
+        finally:
+            self._capacity.release()
+
+    async def _process(self, update, fetched_at: float) -> None:
+        lag = time.monotonic() - fetched_at
+        self.started += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self._lag_total += lag
+        if self.observe_lag:
+            self.observe_lag(lag)
+        await self.application.process_update(update)
+        self.handled += 1
+
+    async def _drain(self) -> None:
+        """Finish all fetched updates, then confirm the offset past them."""
+        await self._finish()
+        if self.offset is not None:
+            # Confirm the last batch; anything this returns stays unconfirmed
+            try:
+                await self.application.bot.get_updates(offset=self.offset, limit=1, timeout=0)
+            except Exception as e:
+                logger.warning(f"Could not confirm the final offset ({e!r})")
+
+    async def _finish(self) -> None:
+        if self._tasks:
+            logger.info(f"Waiting for {len(self._tasks)} fetched updates")
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "offset": self.offset,
+            "batches": self.batches,
+            "fetched": self.fetched,
+            "handled": self.handled,
+            "in_flight": len(self._tasks),
+            "fetch_errors": self.fetch_errors,
+            "avg_batch": self.fetched / self.batches if self.batches else None,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "avg_lag": self._lag_total / self.started if self.started else None,
+        }
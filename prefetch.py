@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+from breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchBuffer:
+    """Bounded queue of ready-to-send items for one content source.
+
+    ``fetch(n)`` returns a list of about ``n`` new items from a single
+    upstream request. Handlers call :meth:`get`, which pops a prefetched item
+    without touching the network. Whenever the buffer drops below
+    ``low_water`` it is topped back up to ``maxsize`` in the background.
+
+    Callers that find the buffer empty don't each send their own request:
+    they queue up and share batched fetches of up to ``batch_size`` items, at
+    most ``max_fetches`` at a time. A batch's items go to the longest-waiting
+    callers first and the rest refill the buffer, so a burst of 200 /cat
+    commands costs about 20 upstream requests instead of 200. If a batch
+    fails, the callers it was fetched for get the error.
+
+    A source that can't be asked for a count (``fixed_batch``) always
+    returns ``batch_size`` items: every fetch asks for a whole batch, and the
+    buffer holds up to ``maxsize + batch_size`` items so none are dropped.
+
+    The last ``keep_recent`` items handed out are kept, so :meth:`stale` can
+    serve one of them again while the source is down.
+    """
+
+    def __init__(self, name: str, fetch, maxsize: int = 5, low_water: int = 2,
+                 keep_recent: int = 0, batch_size: int = 10, max_fetches: int = 4,
+                 fixed_batch: bool = False):
+        self.name = name
+        self.fetch = fetch
+        self.maxsize = maxsize
+        self.low_water = low_water
+        self.batch_size = batch_size
+        self.max_fetches = max_fetches
+        self.fixed_batch = fixed_batch
+        # Room for a whole batch on top of maxsize, so a batch is never cut short
+        self._items = deque(maxlen=maxsize + batch_size)
+        self._recent = deque(maxlen=keep_recent)
+        self._waiters = deque()
+        # Items asked for by the fetches in flight
+        self._requested = 0
+        self._tasks = set()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.items_fetched = 0
+        self.last_fetch_latency = None
+        self._fetch_latency_total = 0.0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def get(self):
+        """Return a prefetched item, or wait for the next batch if none is ready."""
+        if self._items:
+            self.hits += 1
+            item = self._items.popleft()
+            self.schedule_refill()
+        else:
+            self.misses += 1
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._fetch_more()
+            item = await waiter
+        if self._recent.maxlen:
+            self._recent.append(item)
+        return item
+
+    def stale(self):
+        """A recently served item, or None if there is none."""
+        if not self._recent:
+            return None
+        self.stale_served += 1
+        return random.choice(self._recent)
+
+    def schedule_refill(self) -> None:
+        """Start a background refill if the buffer is below its low-water mark."""
+        if len(self._items) < self.low_water:
+            self._fetch_more()
+
+    def _fetch_more(self) -> None:
+        """Start batches for the waiting callers plus the buffer's free space."""
+        wanted = len(self._waiters) + self.maxsize - len(self._items) - self._requested
+        loop = asyncio.get_running_loop()
+        while wanted > 0 and len(self._tasks) < self.max_fetches:
+            n = self.batch_size if self.fixed_batch else min(wanted, self.batch_size)
+            self._requested += n
+            task = loop.create_task(self._fetch_batch(n))
+            self._tasks.add(task)
+            task.add_done_callback(self._fetch_done)
+            wanted -= n
+
+    def _fetch_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        # Callers still waiting (more of them than max_fetches batches cover)
+        if self._waiters:
+            self._fetch_more()
+
+    async def _fetch_batch(self, n: int) -> None:
+        started = time.perf_counter()
+        try:
+            items = await self.fetch(n)
+            if not items:
+                raise LookupError(f"{self.name} source returned no items")
+        except Exception as e:
+            self.fetch_errors += 1
+            # Open circuits are already logged by the breaker
+            if not isinstance(e, CircuitOpenError):
+                logger.warning(f"Prefetch of {n} {self.name} items failed: {e}")
+            for _ in range(n):
+                waiter = self._next_waiter()
+                if waiter is None:
+                    break
+                waiter.set_exception(e)
+            return
+        finally:
+            self._requested -= n
+
+        latency = time.perf_counter() - started
+        self.fetches += 1
+        self.items_fetched += len(items)
+        self.last_fetch_latency = latency
+        self._fetch_latency_total += latency
+        for item in items:
+            waiter = self._next_waiter()
+            if waiter is None:
+                self._items.append(item)
+            else:
+                waiter.set_result(item)
+
+    def _next_waiter(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            # Skip callers that gave up (cancelled)
+            if not waiter.done():
+                return waiter
+        return None
+
+    async def aclose(self) -> None:
+        while self._waiters:
+            self._waiters.popleft().cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "depth": len(self._items),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else None,
+            "waiting": len(self._waiters),
+            "stale_served": self.stale_served,
+            "fetches": self.fetches,
+            "items_fetched": self.items_fetched,
+            "avg_batch": self.items_fetched / self.fetches if self.fetches else None,
+            "fetch_errors": self.fetch_errors,
+            "last_fetch_latency": self.last_fetch_latency,
+            "avg_fetch_latency": (
+                self._fetch_latency_total / self.fetches if self.fetches else None
+            ),
+        }
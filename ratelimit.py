@@ -0,0 +1,254 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first. Callback/inline answers have a short deadline on the
+# client side; plain sends and edits come next; background work goes last.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+
+INTERACTIVE_ENDPOINTS = frozenset({
+    "answerCallbackQuery", "answerInlineQuery", "answerPreCheckoutQuery", "answerShippingQuery",
+})
+
+# Per-chat buckets that are idle and full are swept once there are this many
+SWEEP_THRESHOLD = 10_000
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token can be taken (0 if one is available now)."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0)
+
+    def idle(self, now: float) -> bool:
+        return (
+            now >= self.paused_until
+            and self.tokens + (now - self.updated) * self.rate >= self.burst
+        )
+
+
+class _Lane:
+    __slots__ = ("lock", "bucket", "users")
+
+    def __init__(self, bucket: TokenBucket):
+        self.lock = asyncio.Lock()
+        self.bucket = bucket
+        self.users = 0
+
+
+class SendRateLimiter(BaseRateLimiter):
+    """Throttles outgoing Bot API calls to stay under Telegram's flood limits.
+
+    Every call takes a token from a global bucket (``global_rate`` per
+    second). Calls aimed at a chat first take one from that chat's bucket:
+    ``chat_rate`` per second for private chats, ``group_rate`` for groups
+    (negative chat ids). Calls to one chat go out strictly in order; across
+    chats, the global bucket serves waiting calls by priority, so callback
+    answers are never stuck behind a burst of edits.
+
+    The priority comes from the endpoint (see :data:`INTERACTIVE_ENDPOINTS`)
+    and can be overridden with ``rate_limit_args={"priority": ...}``.
+
+    If Telegram still answers with RetryAfter, the chat (or the whole bot,
+    for calls without a chat) is paused for the requested time and the call
+    is retried up to ``max_retries`` times.
+
+    ``observe(seconds, endpoint, outcome)``, if given, is called with the
+    duration of every Bot API call; outcome is "ok", "retry_after" or the
+    error's class name.
+    """
+
+    __slots__ = (
+        "global_rate", "chat_rate", "group_rate", "chat_burst", "max_retries", "observe",
+        "_global", "_lanes", "_waiters", "_seq", "_pump",
+        "requests", "throttled", "retry_afters", "retries", "_wait_total", "_wait_max",
+        "_recent_waits",
+    )
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, group_rate: float = 20 / 60,
+                 chat_burst: float = 3, max_retries: int = 2, observe=None):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.observe = observe
+        self._global = TokenBucket(global_rate, global_rate)
+        self._lanes = {}
+        self._waiters = []
+        self._seq = itertools.count()
+        self._pump = None
+
+        self.requests = 0
+        # Calls that were held back because sending right away would have
+        # exceeded a limit, i.e. 429s avoided
+        self.throttled = 0
+        self.retry_afters = 0
+        self.retries = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = (rate_limit_args or {}).get(
+            "priority",
+            PRIORITY_INTERACTIVE if endpoint in INTERACTIVE_ENDPOINTS else PRIORITY_NORMAL,
+        )
+        chat_id = data.get("chat_id")
+        if not isinstance(chat_id, int):
+            # Channel usernames and inline/callback answers only count globally
+            chat_id = None
+
+        attempt = 0
+        while True:
+            if chat_id is None:
+                await self._acquire(priority)
+                try:
+                    return await self._call(callback, args, kwargs, endpoint)
+                except RetryAfter as e:
+                    error = e
+                    self._global.pause(_seconds(e.retry_after))
+            else:
+                lane = self._lanes.get(chat_id)
+                if lane is None:
+                    lane = self._lanes[chat_id] = _Lane(self._new_chat_bucket(chat_id))
+                lane.users += 1
+                try:
+                    async with lane.lock:
+                        await self._acquire(priority, lane.bucket)
+                        try:
+                            return await self._call(callback, args, kwargs, endpoint)
+                        except RetryAfter as e:
+                            error = e
+                            # Pause before releasing the lane so the chat's next call waits too
+                            lane.bucket.pause(_seconds(e.retry_after))
+                finally:
+                    lane.users -= 1
+                    if len(self._lanes) > SWEEP_THRESHOLD:
+                        self._sweep()
+
+            self.retry_afters += 1
+            if attempt >= self.max_retries:
+                raise error
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"{endpoint} hit flood control, retrying in {error.retry_after}s")
+
+    async def _call(self, callback, args, kwargs, endpoint):
+        if self.observe is None:
+            return await callback(*args, **kwargs)
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await callback(*args, **kwargs)
+        except RetryAfter:
+            outcome = "retry_after"
+            raise
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            self.observe(time.perf_counter() - start, endpoint, outcome)
+
+    def _new_chat_bucket(self, chat_id: int) -> TokenBucket:
+        if chat_id < 0:
+            return TokenBucket(self.group_rate, self.chat_burst)
+        return TokenBucket(self.chat_rate, self.chat_burst)
+
+    async def _acquire(self, priority: int, chat_bucket: TokenBucket = None) -> None:
+        start = time.monotonic()
+        self.requests += 1
+
+        if chat_bucket is not None:
+            while (delay := chat_bucket.delay(time.monotonic())) > 0:
+                await asyncio.sleep(delay)
+            chat_bucket.take()
+
+        if not self._waiters and self._global.delay(time.monotonic()) <= 0:
+            self._global.take()
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+            if self._pump is None or self._pump.done():
+                self._pump = asyncio.create_task(self._run_pump())
+            await future
+
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            self.throttled += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._recent_waits.append(waited)
+
+    async def _run_pump(self) -> None:
+        """Hands out global tokens to waiting calls, highest priority first."""
+        while self._waiters:
+            delay = self._global.delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._global.take()
+                future.set_result(None)
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        for chat_id in [k for k, lane in self._lanes.items() if not lane.users and lane.bucket.idle(now)]:
+            del self._lanes[chat_id]
+
+    def stats(self) -> dict:
+        waits = sorted(self._recent_waits)
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "retry_afters": self.retry_afters,
+            "retries": self.retries,
+            "waiting": len(self._waiters),
+            "tracked_chats": len(self._lanes),
+            "avg_wait": self._wait_total / self.requests if self.requests else None,
+            "max_wait": self._wait_max,
+            "p95_wait": waits[int(len(waits) * 0.95)] if waits else None,
+        }
+
+
+def _seconds(retry_after) -> float:
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
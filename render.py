@@ -0,0 +1,74 @@
+import logging
+from collections import OrderedDict
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+class EditRenderer:
+    """Remembers what each message currently shows and edits only what changed.
+
+    * Same text and keyboard: the edit is skipped. Telegram would reject it
+      with "message is not modified".
+    * Same text, different keyboard: ``edit_message_reply_markup`` is used.
+    * Otherwise a regular ``edit_message_text``.
+
+    State is kept for the ``maxsize`` most recently rendered messages. An
+    unknown message just gets a full edit.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._shown = OrderedDict()
+
+        self.text_edits = 0
+        self.markup_edits = 0
+        self.skipped = 0
+        self.not_modified = 0
+
+    def remember(self, chat_id: int, message_id: int, text: str, reply_markup=None) -> None:
+        key = (chat_id, message_id)
+        self._shown[key] = (text, reply_markup)
+        self._shown.move_to_end(key)
+        while len(self._shown) > self.maxsize:
+            self._shown.popitem(last=False)
+
+    def forget(self, chat_id: int, message_id: int) -> None:
+        self._shown.pop((chat_id, message_id), None)
+
+    async def edit(self, bot, chat_id: int, message_id: int, text: str, reply_markup=None,
+                   parse_mode=None) -> bool:
+        """Bring the message to (text, reply_markup). Returns False if nothing was sent."""
+        shown = self._shown.get((chat_id, message_id))
+        try:
+            if shown is not None and shown[0] == text:
+                if shown[1] == reply_markup:
+                    self.skipped += 1
+                    return False
+                await bot.edit_message_reply_markup(
+                    chat_id=chat_id, message_id=message_id, reply_markup=reply_markup
+                )
+                self.markup_edits += 1
+            else:
+                await bot.edit_message_text(
+                    text, chat_id=chat_id, message_id=message_id,
+                    reply_markup=reply_markup, parse_mode=parse_mode,
+                )
+                self.text_edits += 1
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                self.forget(chat_id, message_id)
+                raise
+            self.not_modified += 1
+        self.remember(chat_id, message_id, text, reply_markup)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "tracked_messages": len(self._shown),
+            "text_edits": self.text_edits,
+            "markup_edits": self.markup_edits,
+            "skipped": self.skipped,
+            "not_modified": self.not_modified,
+        }
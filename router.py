@@ -0,0 +1,81 @@
+from telegram import Update
+from telegram.ext import BaseHandler
+
+
+class _Route:
+    __slots__ = ("callback", "parse", "args")
+
+    def __init__(self, callback, parse, args):
+        self.callback = callback
+        self.parse = parse
+        self.args = args
+
+
+class CallbackRouter(BaseHandler):
+    """One handler for every inline button, dispatching on callback_data.
+
+    Routes are either exact (``"math_start"``) or prefixes ending in ``_``
+    (``"uno_p_"``). Matching is a dict lookup on the whole data, then on each
+    ``_``-terminated prefix from shortest to longest, so a button costs one
+    or two lookups instead of a regex per registered handler.
+
+    A route's callback is called as ``callback(update, context, *args)``.
+    Exact routes pass their fixed ``args``; prefix routes pass
+    ``parse(rest)``, where ``rest`` is the data after the prefix (default:
+    ``(rest,)``). If ``parse`` raises ValueError, the button matches nothing.
+    """
+
+    __slots__ = ("_exact", "_prefixes")
+
+    def __init__(self, block=True):
+        super().__init__(self._unrouted, block=block)
+        self._exact = {}
+        self._prefixes = {}
+
+    def add(self, data: str, callback, parse=None, args=()) -> None:
+        if data.endswith("_"):
+            self._prefixes[data] = _Route(callback, parse, args)
+        else:
+            if parse is not None:
+                raise ValueError("Only prefix routes (ending in '_') can parse arguments")
+            self._exact[data] = _Route(callback, None, args)
+
+    def wrap_callbacks(self, wrap) -> None:
+        """Replace every route's callback with ``wrap(callback)``."""
+        for route in (*self._exact.values(), *self._prefixes.values()):
+            route.callback = wrap(route.callback)
+
+    def resolve(self, data: str):
+        """``(callback, args)`` for ``data``, or None if no route matches."""
+        route = self._exact.get(data)
+        if route is not None:
+            return route.callback, route.args
+        end = data.find("_")
+        while end != -1:
+            route = self._prefixes.get(data[:end + 1])
+            if route is not None:
+                rest = data[end + 1:]
+                if route.parse is None:
+                    return route.callback, (rest,)
+                try:
+                    return route.callback, route.parse(rest)
+                except ValueError:
+                    return None
+            end = data.find("_", end + 1)
+        return None
+
+    def check_update(self, update: object):
+        if isinstance(update, Update) and update.callback_query:
+            data = update.callback_query.data
+            if isinstance(data, str):
+                return self.resolve(data)
+        return None
+
+    async def handle_update(self, update, application, check_result, context):
+        callback, args = check_result
+        return await callback(update, context, *args)
+
+    @staticmethod
+    async def _unrouted(update, context):
+        # Never called: handle_update dispatches to the matched route
+        return None
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    __slots__ = ("slot", "func", "args", "run_now", "task")
+
+    def __init__(self, key, func, args):
+        # Unkeyed jobs are tracked under themselves
+        self.slot = key if key is not None else self
+        self.func = func
+        self.args = args
+        self.run_now = asyncio.Event()
+        self.task = None
+
+
+class DeferredScheduler:
+    """Runs coroutine functions after a delay, outside the update that scheduled them.
+
+    Handlers schedule follow-up work (such as the UNO bot's move) and return
+    at once, so the webhook request finishes without waiting for the delay.
+    Jobs run as tasks on the bot's long-lived event loop. :meth:`drain` runs
+    every pending job immediately, so work is not lost when the process shuts
+    down.
+
+    That only holds while a long-running runner (polling, or an ASGI server
+    with lifespan events) owns the loop; it then sets ``background``. On a
+    serverless webhook the instance is frozen as soon as the response is
+    sent, so :meth:`defer` waits and runs the job inside the update instead.
+    """
+
+    def __init__(self, background: bool = False):
+        self.background = background
+        self._jobs = {}
+        self.inline = 0
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+
+    def schedule(self, delay: float, func, *args, key=None) -> None:
+        """Call ``await func(*args)`` in ``delay`` seconds.
+
+        At most one job per ``key`` is pending; scheduling again replaces it.
+        """
+        job = _Job(key, func, args)
+        old = self._jobs.get(job.slot)
+        if old is not None:
+            old.task.cancel()
+        job.task = asyncio.get_running_loop().create_task(self._run(job, delay))
+        self._jobs[job.slot] = job
+        self.scheduled += 1
+
+    async def defer(self, delay: float, func, *args, key=None) -> None:
+        """Schedule the job if running in the background, else wait and run it now."""
+        if self.background:
+            self.schedule(delay, func, *args, key=key)
+            return
+        self.inline += 1
+        await asyncio.sleep(delay)
+        await func(*args)
+
+    def cancel(self, key) -> bool:
+        """Drop the pending job for ``key``; returns whether there was one."""
+        job = self._jobs.pop(key, None)
+        if job is None:
+            return False
+        job.task.cancel()
+        return True
+
+    def pending(self, key) -> bool:
+        return key in self._jobs
+
+    async def _run(self, job: _Job, delay: float) -> None:
+        try:
+            await asyncio.wait_for(job.run_now.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        if self._jobs.get(job.slot) is job:
+            del self._jobs[job.slot]
+        try:
+            await job.func(*job.args)
+            self.completed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Deferred job {job.func.__name__} failed: {e}")
+
+    async def drain(self) -> None:
+        """Run all pending jobs now and wait for them to finish."""
+        jobs = list(self._jobs.values())
+        for job in jobs:
+            job.run_now.set()
+        await asyncio.gather(*(job.task for job in jobs), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "background": self.background,
+            "pending": len(self._jobs),
+            "inline": self.inline,
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,366 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from collections import deque
+
+from telegram import Update
+
+from ingest import RecentUpdateIds
+from polling import PollingRunner
+from ratelimit import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# A worker writes one byte back per update it has finished
+ACK = b"."
+# Longest update line a worker accepts from the ingress
+MAX_LINE = 1024 * 1024
+
+
+def shard_key(data: dict):
+    """Routing key of a raw update: the chat id, or the user id without a chat.
+
+    The raw-JSON counterpart of dispatcher.chat_key. A private chat's id is
+    its user's id, so a user's private chat and their inline queries land on
+    the same shard.
+    """
+    for field, payload in data.items():
+        if field == "update_id" or not isinstance(payload, dict):
+            continue
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat:
+            return chat.get("id")
+        user = payload.get("from") or payload.get("user")
+        if user:
+            return user.get("id")
+    return None
+
+
+def shard_for(data: dict, shards: int) -> int:
+    key = shard_key(data)
+    return key % shards if isinstance(key, int) else 0
+
+
+def shard_path(path: str, index: int) -> str:
+    """A shard's own copy of a data file: ``bot.sqlite3`` -> ``bot.shard0.sqlite3``.
+
+    Each worker caches user and chat data in memory and writes it back, so
+    two workers sharing one file would overwrite each other's state. Data
+    stays with the shard count it was written under.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{index}{ext}"
+
+
+class _Shard:
+    __slots__ = ("index", "process", "writer", "watcher", "in_flight", "sent", "done",
+                 "restarts", "started_at", "backoff")
+
+    def __init__(self, index: int, backoff: float):
+        self.index = index
+        self.process = None
+        self.writer = None
+        self.watcher = None
+        self.in_flight = 0
+        self.sent = 0
+        self.done = 0
+        self.restarts = 0
+        self.started_at = None
+        self.backoff = backoff
+
+
+class ShardSupervisor:
+    """Runs ``workers`` bot processes and routes each update to one by chat.
+
+    The ingress (polling or webhook) calls :meth:`submit` with raw updates.
+    An update goes to shard ``chat_id % workers`` (see :func:`shard_key`), so
+    a chat's state only ever lives in one process and its updates arrive
+    there in order. Each shard is connected by a socket pair carrying one
+    JSON update per line; the worker answers with one :data:`ACK` byte per
+    finished update, which keeps an exact in-flight count per shard. When a
+    shard has ``max_pending`` updates in flight, :meth:`submit` returns FULL
+    (same contract as ingest.UpdateIngestQueue, including dropping
+    update_ids seen in the last ``dedup_window`` updates as DUPLICATE).
+
+    Workers are started with the "spawn" method, as ``target(index, sock)``
+    in a fresh interpreter, so ``target`` must be a module-level function.
+    A worker that exits while the supervisor runs is restarted, after
+    ``restart_delay`` seconds, doubling while it keeps crashing within a
+    minute of starting. Updates it had in flight are lost and counted.
+
+    :meth:`stop` closes every shard's input; workers finish what they were
+    sent and exit.
+    """
+
+    ACCEPTED = "accepted"
+    DUPLICATE = "duplicate"
+    INVALID = "invalid"
+    FULL = "full"
+
+    def __init__(self, target, workers: int = 2, max_pending: int = 1000,
+                 restart_delay: float = 1.0, stop_timeout: float = 30,
+                 dedup_window: int = 10000):
+        self.target = target
+        self.workers = workers
+        self.max_pending = max_pending
+        self.restart_delay = restart_delay
+        self.stop_timeout = stop_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._shards = [_Shard(i, restart_delay) for i in range(workers)]
+        self._seen = RecentUpdateIds(dedup_window)
+        self._stopping = False
+
+        self.accepted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.full = 0
+        self.lost = 0
+
+    async def start(self) -> None:
+        self._stopping = False
+        for shard in self._shards:
+            await self._spawn(shard)
+        logger.info(f"Started {self.workers} shard workers")
+
+    def submit(self, data) -> str:
+        """Route one update; returns one of ACCEPTED, DUPLICATE, INVALID or FULL."""
+        update_id = data.get("update_id") if isinstance(data, dict) else None
+        if not isinstance(update_id, int):
+            self.invalid += 1
+            return self.INVALID
+        if update_id in self._seen:
+            self.duplicates += 1
+            return self.DUPLICATE
+        shard = self._shards[shard_for(data, self.workers)]
+        if shard.writer is None or shard.in_flight >= self.max_pending:
+            # Restarting or behind: the caller retries (polling) or sheds (webhook)
+            self.full += 1
+            return self.FULL
+        self._seen.add(update_id)
+        shard.writer.write(json.dumps(data, separators=(",", ":")).encode() + b"\n")
+        shard.in_flight += 1
+        shard.sent += 1
+        self.accepted += 1
+        return self.ACCEPTED
+
+    async def _spawn(self, shard: _Shard) -> None:
+        ours, theirs = socket.socketpair()
+        process = self._context.Process(
+            target=self.target, args=(shard.index, theirs), name=f"shard-{shard.index}", daemon=True
+        )
+        process.start()
+        theirs.close()
+        reader, shard.writer = await asyncio.open_connection(sock=ours)
+        shard.process = process
+        shard.started_at = time.monotonic()
+        shard.watcher = asyncio.create_task(self._watch(shard, reader))
+
+    async def _watch(self, shard: _Shard, reader: asyncio.StreamReader) -> None:
+        """Count acks until the worker goes away, then restart it unless stopping."""
+        while True:
+            acks = await reader.read(4096)
+            if not acks:
+                break
+            shard.in_flight -= len(acks)
+            shard.done += len(acks)
+
+        process = shard.process
+        await asyncio.to_thread(process.join, self.stop_timeout)
+        shard.writer.close()
+        shard.writer = None
+        if self._stopping:
+            return
+
+        lost, shard.in_flight = shard.in_flight, 0
+        self.lost += lost
+        shard.restarts += 1
+        if time.monotonic() - shard.started_at >= 60:
+            shard.backoff = self.restart_delay
+        delay = shard.backoff
+        shard.backoff = min(60.0, delay * 2)
+        logger.error(
+            f"Shard {shard.index} exited with code {process.exitcode}, {lost} updates lost; "
+            f"restarting in {delay:.0f}s"
+        )
+        await asyncio.sleep(delay)
+        if not self._stopping:
+            await self._spawn(shard)
+
+    async def stop(self) -> None:
+        """Let every worker finish the updates it was sent, then wait for it to exit."""
+        self._stopping = True
+        watchers = []
+        for shard in self._shards:
+            if shard.writer is not None:
+                # Half-close: the worker reads EOF but can still send its acks
+                shard.writer.write_eof()
+                watchers.append(shard.watcher)
+            elif shard.watcher is not None:
+                # Waiting to restart
+                shard.watcher.cancel()
+        if watchers:
+            await asyncio.wait(watchers, timeout=self.stop_timeout)
+        for shard in self._shards:
+            if shard.process is not None and shard.process.is_alive():
+                logger.warning(f"Shard {shard.index} did not stop in time, terminating it")
+                shard.process.terminate()
+        logger.info(f"Shard workers stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "full": self.full,
+            "lost": self.lost,
+            "shards": [
+                {
+                    "alive": shard.process is not None and shard.process.is_alive(),
+                    "in_flight": shard.in_flight,
+                    "sent": shard.sent,
+                    "done": shard.done,
+                    "restarts": shard.restarts,
+                }
+                for shard in self._shards
+            ],
+        }
+
+
+class ShardWorker(PollingRunner):
+    """A shard's bot process: handles the updates the ingress sends over ``sock``.
+
+    Same loop as polling (per-chat ordering, ``max_pending``, lag), with the
+    socket from the ShardSupervisor in place of getUpdates. EOF on the socket
+    means stop: the worker finishes its updates and exits. SIGINT is ignored,
+    since Ctrl-C reaches the whole process group and the ingress coordinates
+    the shutdown.
+    """
+
+    SIGNALS = (signal.SIGTERM,)
+
+    def __init__(self, application, sock: socket.socket, max_pending: int = 1000,
+                 observe_lag=None):
+        super().__init__(application, max_pending=max_pending, observe_lag=observe_lag, log_every=0)
+        self.sock = sock
+        self._reader = None
+        self._writer = None
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        super().run()
+
+    async def _open(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(sock=self.sock, limit=MAX_LINE)
+        app = self.application
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        await app.start()
+
+    async def _close(self) -> None:
+        try:
+            await super()._close()
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+
+    async def _get_updates(self) -> list:
+        line = await self._reader.readline()
+        if not line:
+            self._stopping.set()
+            return []
+        return [Update.de_json(json.loads(line), self.application.bot)]
+
+    async def _handle(self, update, fetched_at: float) -> None:
+        try:
+            await super()._handle(update, fetched_at)
+        finally:
+            self._writer.write(ACK)
+
+    async def _drain(self) -> None:
+        # The ingress owns the getUpdates offset
+        await self._finish()
+
+
+class ShardedPollingRunner(PollingRunner):
+    """The ingress in polling mode: fetches updates and routes them to shards.
+
+    Only the Bot is used here; handlers run in the workers. Updates for a
+    full (or restarting) shard are held back in that shard's backlog and
+    retried, so one slow shard doesn't stall the others; fetching pauses once
+    ``max_pending`` updates are held back. On stop, the backlogs are sent
+    (waiting up to the supervisor's ``stop_timeout``) and the workers finish
+    everything they were sent before the final offset is confirmed.
+    """
+
+    def __init__(self, application, supervisor: ShardSupervisor, timeout: float = 30,
+                 limit: int = 100, max_pending: int = 1000, allowed_updates=None):
+        super().__init__(application, timeout, limit, max_pending, allowed_updates=allowed_updates)
+        self.supervisor = supervisor
+        self._backlogs = [deque() for _ in range(supervisor.workers)]
+        self._backlogged = 0
+        self._flusher = None
+        self.dropped = 0
+
+    async def _open(self) -> None:
+        bot = self.application.bot
+        await bot.initialize()
+        await bot.delete_webhook(rate_limit_args={"priority": PRIORITY_BACKGROUND})
+        await self.supervisor.start()
+
+    async def _close(self) -> None:
+        await self.application.bot.shutdown()
+
+    async def _dispatch(self, updates: list, fetched_at: float) -> None:
+        for update in updates:
+            data = update.to_dict()
+            backlog = self._backlogs[shard_for(data, self.supervisor.workers)]
+            # Behind earlier updates of the same shard, to keep each chat's order
+            if backlog or self.supervisor.submit(data) == self.supervisor.FULL:
+                backlog.append(data)
+                self._backlogged += 1
+            self.handled += 1
+        if self._backlogged and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush())
+        while self._backlogged >= self.max_pending and not self._stopping.is_set():
+            await asyncio.sleep(0.01)
+
+    async def _flush(self) -> None:
+        """Retry held-back updates until every backlog is empty."""
+        try:
+            while self._backlogged:
+                for backlog in self._backlogs:
+                    while backlog and self.supervisor.submit(backlog[0]) != self.supervisor.FULL:
+                        backlog.popleft()
+                        self._backlogged -= 1
+                if self._backlogged:
+                    await asyncio.sleep(0.01)
+        finally:
+            self._flusher = None
+
+    async def _finish(self) -> None:
+        if self._flusher is not None:
+            logger.info(f"Sending {self._backlogged} held-back updates")
+            try:
+                await asyncio.wait_for(asyncio.shield(self._flusher), self.supervisor.stop_timeout)
+            except asyncio.TimeoutError:
+                self._flusher.cancel()
+                self.dropped += self._backlogged
+                logger.error(f"{self._backlogged} updates for unavailable shards were dropped")
+                for backlog in self._backlogs:
+                    backlog.clear()
+                self._backlogged = 0
+        await self.supervisor.stop()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["backlogged"] = self._backlogged
+        stats["dropped"] = self.dropped
+        stats["shards"] = self.supervisor.stats()
+        return stats
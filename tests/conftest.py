@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# bot.py reads its configuration at import time
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ["PERSISTENCE_PATH"] = ""
+os.environ["SEND_RATE_GLOBAL"] = "1e9"
+os.environ["SEND_RATE_CHAT"] = "1e9"
+
+from telegram.request import BaseRequest  # noqa: E402
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "test_bot"}
+
+
+class FakeTelegram(BaseRequest):
+    """Answers Bot API calls locally and records them as (method, params)."""
+
+    def __init__(self):
+        self.calls = []
+        self._message_ids = itertools.count(1000)
+        self.last_message_id = None
+
+    @property
+    def read_timeout(self):
+        return 5
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append((endpoint, params))
+        if endpoint == "getMe":
+            result = BOT_USER
+        elif endpoint.startswith("send"):
+            self.last_message_id = next(self._message_ids)
+            result = self._message(self.last_message_id, params)
+        elif endpoint.startswith("edit"):
+            result = self._message(params["message_id"], params)
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    @staticmethod
+    def _message(message_id, params):
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": params.get("chat_id"), "type": "private"},
+            "text": params.get("text", ""),
+        }
+
+    def sent(self, endpoint):
+        return [params for name, params in self.calls if name == endpoint]
+
+
+class Updates:
+    """Builds raw updates from one user in their private chat."""
+
+    def __init__(self, user_id=7):
+        self.user_id = user_id
+        self._ids = itertools.count(1)
+
+    def _user(self):
+        return {"id": self.user_id, "is_bot": False, "first_name": "User"}
+
+    def _chat(self):
+        return {"id": self.user_id, "type": "private"}
+
+    def command(self, text):
+        update_id = next(self._ids)
+        return {"update_id": update_id, "message": {
+            "message_id": update_id, "date": int(time.time()), "chat": self._chat(),
+            "from": self._user(), "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+        }}
+
+    def button(self, data, message_id):
+        update_id = next(self._ids)
+        return {"update_id": update_id, "callback_query": {
+            "id": str(update_id), "chat_instance": "test", "data": data, "from": self._user(),
+            "message": {"message_id": message_id, "date": int(time.time()), "chat": self._chat(),
+                        "from": BOT_USER, "text": "board"},
+        }}
+
+
+@pytest.fixture(scope="session")
+def bot_module():
+    import bot
+    return bot
+
+
+@pytest.fixture
+def telegram(bot_module):
+    fake = FakeTelegram()
+    bot_module.bot_app.bot._request = (fake, fake)
+    return fake
+
+
+@pytest.fixture
+def webhook(bot_module, telegram):
+    """POST one update to the ASGI app the way the serverless runtime does (no lifespan)."""
+
+    def post(update):
+        async def call():
+            sent = []
+
+            async def receive():
+                return {"type": "http.request", "body": json.dumps(update).encode()}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "method": "POST", "path": "/"}
+            await bot_module.asgi_app(scope, receive, send)
+            return sent[0]["status"]
+
+        return asyncio.run(call())
+
+    return post
@@ -0,0 +1,38 @@
+import time
+
+from conftest import Updates
+
+
+def answer_button(bot, expires, correct=True):
+    index = bot.math_bank.sample()
+    choices = bot.math_bank.choices(index, bot.math_layout(index, expires))
+    answer = choices.index(bot.math_bank.ANSWER[index])
+    position = answer if correct else (answer + 1) % 4
+    return f"math_ans_{bot.math_signer.sign(index, expires, position)}"
+
+
+def test_answer_is_checked_without_server_state(bot_module, webhook, telegram):
+    # No /math first: any instance can check a button another one sent
+    updates = Updates(user_id=21)
+    data = answer_button(bot_module, int(time.time()) + 60)
+
+    assert webhook(updates.button(data, 5)) == 200
+    assert telegram.sent("editMessageText")[-1]["text"].startswith("✅")
+
+
+def test_expired_answer_is_rejected(bot_module, webhook, telegram):
+    updates = Updates(user_id=22)
+    data = answer_button(bot_module, int(time.time()) - 1)
+
+    assert webhook(updates.button(data, 5)) == 200
+    assert not telegram.sent("editMessageText")
+    assert "no longer valid" in telegram.sent("answerCallbackQuery")[-1]["text"]
+
+
+def test_answering_replaces_the_buttons(bot_module, webhook, telegram):
+    updates = Updates(user_id=23)
+    data = answer_button(bot_module, int(time.time()) + 60, correct=False)
+
+    assert webhook(updates.button(data, 5)) == 200
+    markup = telegram.sent("editMessageText")[-1]["reply_markup"]
+    assert "math_ans_" not in str(markup)
@@ -0,0 +1,63 @@
+import asyncio
+import pickle
+
+import pytest
+
+from persistence import WriteBehindPersistence
+
+
+class MemoryPersistence(WriteBehindPersistence):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rows = {}
+        self.failures = 0
+
+    def _load(self, kind, key):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("store unavailable")
+        return self.rows.get((kind, key))
+
+    def _load_all(self, kind):
+        return {key: blob for (k, key), blob in self.rows.items() if k == kind}
+
+    def _write(self, batch):
+        for row, blob in batch.items():
+            if blob is None:
+                self.rows.pop(row, None)
+            else:
+                self.rows[row] = blob
+
+
+def test_failed_load_is_retried():
+    async def run():
+        store = MemoryPersistence()
+        store.rows[("user", 1)] = pickle.dumps({"uno": "game"})
+        store.failures = 1
+        data = {}
+
+        with pytest.raises(OSError):
+            await store.refresh_user_data(1, data)
+        await store.refresh_user_data(1, data)
+        assert data == {"uno": "game"}
+        await store.close()
+
+    asyncio.run(run())
+
+
+def test_loaded_keys_are_bounded():
+    async def run():
+        store = MemoryPersistence(max_loaded=2)
+        for user_id in (1, 2, 3):
+            await store.refresh_user_data(user_id, {})
+        assert list(store._loaded["user"]) == [2, 3]
+
+        # User 1 was forgotten: loading it again keeps a newer pending write
+        store.rows[("user", 1)] = pickle.dumps({"streak": 1})
+        data = {"streak": 2}
+        await store.update_user_data(1, data)
+        await store.refresh_user_data(1, data)
+        assert data == {"streak": 2}
+        await store.close()
+
+    asyncio.run(run())
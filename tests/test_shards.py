@@ -0,0 +1,63 @@
+import asyncio
+
+from telegram import Update
+
+from shards import ShardSupervisor, ShardedPollingRunner, shard_for, shard_path
+
+
+class FakeWriter:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.append(data)
+
+
+class FakeApplication:
+    bot = None
+
+
+def message(update_id, chat_id):
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "chat": {"id": chat_id, "type": "private"}, "text": "hi",
+    }}
+
+
+def supervisor_with_writers(workers=2, max_pending=1000):
+    supervisor = ShardSupervisor(target=None, workers=workers, max_pending=max_pending)
+    for shard in supervisor._shards:
+        shard.writer = FakeWriter()
+    return supervisor
+
+
+def test_redelivered_update_is_routed_once():
+    supervisor = supervisor_with_writers()
+    assert supervisor.submit(message(1, 10)) == supervisor.ACCEPTED
+    assert supervisor.submit(message(1, 10)) == supervisor.DUPLICATE
+    assert sum(len(shard.writer.lines) for shard in supervisor._shards) == 1
+
+
+def test_full_shard_does_not_stall_the_others():
+    async def run():
+        supervisor = supervisor_with_writers()
+        down = supervisor._shards[0]
+        down.writer = None  # restarting
+        runner = ShardedPollingRunner(FakeApplication(), supervisor, max_pending=100)
+        runner._stopping = asyncio.Event()
+        updates = [Update.de_json(message(i, chat), None) for i, chat in enumerate([2, 3, 4, 5], 1)]
+
+        await asyncio.wait_for(runner._dispatch(updates, 0.0), 1)
+        assert len(supervisor._shards[1].writer.lines) == 2
+        assert runner.stats()["backlogged"] == 2
+
+        down.writer = FakeWriter()
+        await asyncio.sleep(0.05)
+        assert runner.stats()["backlogged"] == 0
+        assert [b'"update_id":1' in line for line in down.writer.lines] == [True, False]
+
+    asyncio.run(run())
+
+
+def test_shard_path():
+    assert shard_path("/tmp/telebot.sqlite3", 1) == "/tmp/telebot.shard1.sqlite3"
+    assert shard_for(message(1, 7), 2) == 1
@@ -0,0 +1,32 @@
+from conftest import Updates
+
+
+def test_bot_move_is_played_within_the_webhook_request(bot_module, webhook, telegram):
+    updates = Updates(user_id=11)
+    assert webhook(updates.command("/uno")) == 200
+    board = telegram.last_message_id
+    user_data = bot_module.bot_app.user_data[updates.user_id]
+
+    assert webhook(updates.button("uno_draw", board)) == 200
+
+    # Serverless (no lifespan): the move is not left to a task that would
+    # be frozen with the instance
+    assert not bot_module.scheduler.background
+    assert not bot_module.scheduler.pending(updates.user_id)
+    assert "uno_bot_pending" not in user_data
+    edit = telegram.sent("editMessageText")[-1]
+    assert edit["message_id"] == board
+    assert edit["text"].startswith("🤖 Bot") or "BOT WINS" in edit["text"]
+
+
+def test_default_config_merges_the_thinking_edit(bot_module, webhook, telegram):
+    assert bot_module.BOT_THINK_DELAY <= bot_module.THINKING_MERGE_WINDOW
+    updates = Updates(user_id=12)
+    assert webhook(updates.command("/uno")) == 200
+    board = telegram.last_message_id
+
+    assert webhook(updates.button("uno_draw", board)) == 200
+
+    edits = telegram.sent("editMessageText")
+    assert len(edits) == 1
+    assert "thinking" not in edits[0]["text"]
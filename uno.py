@@ -0,0 +1,90 @@
+import random
+
+# A card is a small int, color * 12 + value, indexing into COLORS and VALUES.
+# Hands, deck and discard pile are bytearrays, so a whole game serializes to a
+# few dozen bytes.
+COLORS = ['🔴', '🟡', '🟢', '🔵']
+VALUES = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'Skip', 'Draw2']
+DECK_SIZE = len(COLORS) * len(VALUES)
+HAND_SIZE = 7
+
+# Precomputed per-card lookups
+CARD_COLOR = bytes(card // len(VALUES) for card in range(DECK_SIZE))
+CARD_VALUE = bytes(card % len(VALUES) for card in range(DECK_SIZE))
+CARD_LABELS = [f"{COLORS[CARD_COLOR[c]]} {VALUES[CARD_VALUE[c]]}" for c in range(DECK_SIZE)]
+BUTTON_LABELS = [f"{COLORS[CARD_COLOR[c]]}{VALUES[CARD_VALUE[c]]}" for c in range(DECK_SIZE)]
+# PLAYABLE[top * DECK_SIZE + card] is 1 if card may be played on top
+PLAYABLE = bytes(
+    CARD_COLOR[card] == CARD_COLOR[top] or CARD_VALUE[card] == CARD_VALUE[top]
+    for top in range(DECK_SIZE)
+    for card in range(DECK_SIZE)
+)
+
+
+def create_deck() -> bytearray:
+    return bytearray(range(DECK_SIZE))
+
+
+def can_play(card: int, top_card: int) -> bool:
+    return PLAYABLE[top_card * DECK_SIZE + card] == 1
+
+
+class UnoGame:
+    """One game against the bot: deck, both hands and the discard pile."""
+
+    __slots__ = ("deck", "user_hand", "bot_hand", "discard")
+
+    def __init__(self, deck: bytearray, user_hand: bytearray, bot_hand: bytearray,
+                 discard: bytearray):
+        self.deck = deck
+        self.user_hand = user_hand
+        self.bot_hand = bot_hand
+        self.discard = discard
+
+    @classmethod
+    def deal(cls, rng=random) -> "UnoGame":
+        """Shuffle a fresh deck and deal the opening hands and top card."""
+        deck = create_deck()
+        rng.shuffle(deck)
+        user_hand = deck[-HAND_SIZE:]
+        bot_hand = deck[-2 * HAND_SIZE:-HAND_SIZE]
+        del deck[-2 * HAND_SIZE:]
+        discard = bytearray((deck.pop(),))
+        return cls(deck, user_hand, bot_hand, discard)
+
+    @property
+    def top(self) -> int:
+        return self.discard[-1]
+
+    # --- Serialization ---
+    def serialize(self) -> bytes:
+        """Length header (deck, user, bot) followed by the four card runs."""
+        header = bytes((len(self.deck), len(self.user_hand), len(self.bot_hand)))
+        return header + self.deck + self.user_hand + self.bot_hand + self.discard
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "UnoGame":
+        n_deck, n_user, n_bot = data[0], data[1], data[2]
+        i = 3
+        deck = bytearray(data[i:i + n_deck])
+        i += n_deck
+        user_hand = bytearray(data[i:i + n_user])
+        i += n_user
+        bot_hand = bytearray(data[i:i + n_bot])
+        discard = bytearray(data[i + n_bot:])
+        return cls(deck, user_hand, bot_hand, discard)
+
+    def __reduce__(self):
+        # Pickle (persistence) stores just the compact byte form
+        return (UnoGame.deserialize, (self.serialize(),))
+
+    def __eq__(self, other):
+        if not isinstance(other, UnoGame):
+            return NotImplemented
+        return self.serialize() == other.serialize()
+
+    def __repr__(self) -> str:
+        return (
+            f"UnoGame(deck={len(self.deck)}, user={len(self.user_hand)}, "
+            f"bot={len(self.bot_hand)}, top={CARD_LABELS[self.top]!r})"
+        )
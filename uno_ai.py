@@ -0,0 +1,121 @@
+import random
+
+from uno import CARD_COLOR, CARD_VALUE, COLORS, DECK_SIZE, VALUES, UnoGame, can_play
+
+# Every card is unique, so a set of cards is a 48-bit mask. A hand indexed by
+# color or value is ``hand & COLOR_MASK[c]`` / ``hand & VALUE_MASK[v]``, and
+# the cards that can go on ``top`` are ``hand & PLAYABLE_MASK[top]``.
+COLOR_MASK = [
+    sum(1 << card for card in range(DECK_SIZE) if CARD_COLOR[card] == color)
+    for color in range(len(COLORS))
+]
+VALUE_MASK = [
+    sum(1 << card for card in range(DECK_SIZE) if CARD_VALUE[card] == value)
+    for value in range(len(VALUES))
+]
+PLAYABLE_MASK = [
+    COLOR_MASK[CARD_COLOR[top]] | VALUE_MASK[CARD_VALUE[top]] for top in range(DECK_SIZE)
+]
+ALL_CARDS = (1 << DECK_SIZE) - 1
+ACTION_MASK = VALUE_MASK[VALUES.index('Skip')] | VALUE_MASK[VALUES.index('Draw2')]
+NUMBER_MASK = ALL_CARDS & ~ACTION_MASK
+
+DEFAULT_STRATEGY = 'count_colors'
+
+
+def to_mask(cards) -> int:
+    mask = 0
+    for card in cards:
+        mask |= 1 << card
+    return mask
+
+
+def _lowest(mask: int) -> int:
+    return (mask & -mask).bit_length() - 1
+
+
+# --- Strategies: (hand, top, seen) -> card to play, or None to draw ---
+# ``hand`` and ``seen`` are card masks; ``seen`` holds the cards already
+# played, which the opponent can't be holding.
+def greedy(hand: int, top: int, seen: int):
+    """Play any matching card."""
+    playable = hand & PLAYABLE_MASK[top]
+    return _lowest(playable) if playable else None
+
+
+def hold_actions(hand: int, top: int, seen: int):
+    """Play number cards first and keep Skip/Draw2 for when nothing else fits."""
+    playable = hand & PLAYABLE_MASK[top]
+    if not playable:
+        return None
+    return _lowest(playable & NUMBER_MASK or playable)
+
+
+def count_colors(hand: int, top: int, seen: int):
+    """Count cards: play the card the opponent is least likely to answer.
+
+    The opponent can only hold cards we haven't seen, so play the candidate
+    with the fewest unseen cards matching it (same color or value).
+    """
+    playable = hand & PLAYABLE_MASK[top]
+    if not playable:
+        return None
+    unseen = ALL_CARDS & ~(hand | seen)
+    best = None
+    best_score = None
+    while playable:
+        card = _lowest(playable)
+        playable &= playable - 1
+        score = (unseen & PLAYABLE_MASK[card]).bit_count()
+        if best_score is None or score < best_score:
+            best, best_score = card, score
+    return best
+
+
+STRATEGIES = {
+    'greedy': greedy,
+    'hold_actions': hold_actions,
+    'count_colors': count_colors,
+}
+
+
+def pick_card(game: UnoGame, strategy: str = DEFAULT_STRATEGY):
+    """The card the bot plays from its hand in ``game``, or None if it must draw."""
+    return STRATEGIES[strategy](to_mask(game.bot_hand), game.top, to_mask(game.discard))
+
+
+def simulate(strategy_a: str, strategy_b: str, rng=random) -> int:
+    """Play one headless game between two strategies, ``a`` moving first.
+
+    Follows the bot's rules: play a matching card or draw one and pass. Every
+    move is checked with :func:`uno.can_play`. Returns 0 if ``a`` wins, 1 if
+    ``b`` wins and -1 if the deck runs out with both players stuck.
+    """
+    game = UnoGame.deal(rng)
+    deck = game.deck
+    hands = [to_mask(game.user_hand), to_mask(game.bot_hand)]
+    choose = (STRATEGIES[strategy_a], STRATEGIES[strategy_b])
+    top = game.top
+    seen = 1 << top
+    player = 0
+    passes = 0
+    while passes < 2:
+        hand = hands[player]
+        card = choose[player](hand, top, seen)
+        if card is None:
+            if deck:
+                hands[player] = hand | 1 << deck.pop()
+                passes = 0
+            else:
+                passes += 1
+        else:
+            if not hand >> card & 1 or not can_play(card, top):
+                raise AssertionError(f"{choose[player].__name__} made an illegal move")
+            hands[player] = hand = hand & ~(1 << card)
+            top = card
+            seen |= 1 << card
+            passes = 0
+            if not hand:
+                return player
+        player ^= 1
+    return -1
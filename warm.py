@@ -0,0 +1,164 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+import uuid
+
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+
+class WarmApplication:
+    """Keeps one initialized Application alive for the whole process.
+
+    The webhook used to initialize and shut down the Application around every
+    update. Instead, the Application is initialized lazily on the first update
+    and then reused. All bot work runs on a single background event loop, so the
+    HTTP client and other loop-bound resources are never shared across loops,
+    no matter which thread the web server calls us from.
+    """
+
+    def __init__(self, application: Application):
+        self.application = application
+        self.instance_id = uuid.uuid4().hex[:8]
+        self.created_at = time.time()
+        self.initialized_at = None
+        self.cold_start_seconds = None
+        self.updates_served = 0
+
+        self._lock = threading.Lock()
+        self._init_lock = asyncio.Lock()
+        self._loop = None
+        self._thread = None
+        self._closed = False
+
+    # --- Event loop ---
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The background loop all bot coroutines run on (started on demand)."""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(
+                        target=loop.run_forever, name=f"bot-loop-{self.instance_id}", daemon=True
+                    )
+                    thread.start()
+                    self._thread = thread
+                    self._loop = loop
+                    atexit.register(self.close)
+        return self._loop
+
+    def bind_running_loop(self) -> None:
+        """Use the caller's running loop as the bot loop (e.g. an ASGI server's).
+
+        Must be called before anything started the background loop. The owner
+        of the loop is then responsible for calling :meth:`aclose`.
+        """
+        with self._lock:
+            if self._loop is not None:
+                raise RuntimeError("The bot loop is already running")
+            self._loop = asyncio.get_running_loop()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the bot loop from any thread and wait for the result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def submit(self, coro):
+        """Await a coroutine on the bot loop from any event loop, without blocking it."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    # --- Lifecycle ---
+    async def ensure_initialized(self) -> Application:
+        """Initialize the Application once; later calls return immediately."""
+        if self.initialized_at is None:
+            async with self._init_lock:
+                if self.initialized_at is None:
+                    started = time.perf_counter()
+                    await self.application.initialize()
+                    # Same hooks run_polling()/run_webhook() would call
+                    if self.application.post_init:
+                        await self.application.post_init(self.application)
+                    self.cold_start_seconds = time.perf_counter() - started
+                    self.initialized_at = time.time()
+                    logger.info(
+                        "Warm instance %s initialized in %.3fs",
+                        self.instance_id,
+                        self.cold_start_seconds,
+                    )
+        return self.application
+
+    async def process_update_json(self, data: dict) -> None:
+        """Decode a raw update and feed it through the warm Application."""
+        application = await self.ensure_initialized()
+        update = Update.de_json(data, application.bot)
+        # Through the update processor, so its concurrency/ordering rules apply
+        await application.update_processor.process_update(
+            update, application.process_update(update)
+        )
+        if application.persistence:
+            # The process may be frozen or recycled once we answer, so hand the
+            # touched user/chat data to the persistence and wait for its
+            # (batched) commit instead of relying on the periodic update job.
+            await application.update_persistence()
+            await application.persistence.flush()
+        self.updates_served += 1
+
+    def process(self, data: dict, timeout=None) -> None:
+        """Thread-safe entry point for synchronous web frameworks."""
+        self.run(self.process_update_json(data), timeout)
+
+    async def shutdown(self) -> None:
+        if self.initialized_at is not None:
+            if self.application.post_stop:
+                await self.application.post_stop(self.application)
+            await self.application.shutdown()
+            if self.application.post_shutdown:
+                await self.application.post_shutdown(self.application)
+            logger.info(
+                "Warm instance %s shut down after serving %d updates",
+                self.instance_id,
+                self.updates_served,
+            )
+            self.initialized_at = None
+
+    async def aclose(self) -> None:
+        """Shut down from the bot loop itself (when it is owned by someone else)."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        await self.shutdown()
+
+    def close(self) -> None:
+        """Shut the Application down and stop the loop (registered with atexit)."""
+        with self._lock:
+            # Bound loops are shut down by their owner through aclose()
+            if self._closed or self._thread is None:
+                return
+            self._closed = True
+        try:
+            self.run(self.shutdown(), timeout=10)
+        except Exception as e:
+            logger.error(f"Error shutting down warm instance: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        """How much work this warm instance has amortized its cold start over."""
+        return {
+            "instance_id": self.instance_id,
+            "initialized": self.initialized_at is not None,
+            "uptime_seconds": round(time.time() - self.created_at, 3),
+            "cold_start_seconds": self.cold_start_seconds,
+            "updates_served": self.updates_served,
+        }